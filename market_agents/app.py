@@ -1,273 +1,17 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gradio as gr
-from src.graph import MarketResearchGraph
+from src.audio import audio_key, extract_summary, stream_speech, synthesize
+from src.document import parse_report
+from src.graph import TOKEN_EVENT
+from src.history import HistoryManager
+from src.registry import get_graph
+from src.tracing import TRACE_FILE, format_trace_summary, load_trace, summarize_trace
+from src.workspace import Workspace, cleanup_stale_workspaces
 import os
-import markdown
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
 from datetime import datetime
 
-class ReportPDF(FPDF):
-    def __init__(self, topic):
-        super().__init__()
-        self.topic = topic
-        self.set_auto_page_break(auto=True, margin=20)
-        self.set_margins(20, 20, 20)
-        
-    def header(self):
-        if self.page_no() > 1:
-            self.set_draw_color(226, 232, 240) 
-            self.line(20, 25, 190, 25)
-            
-            self.set_y(15)
-            self.set_font('helvetica', 'B', 9)
-            self.set_text_color(100, 116, 139)  # Slate-500
-            self.cell(0, 10, 'MARKET INTELLIGENCE REPORT', new_x=XPos.RIGHT, new_y=YPos.TOP, align='L')
-            
-            self.set_font('helvetica', '', 9)
-            self.cell(0, 10, datetime.now().strftime('%Y-%m-%d'), new_x=XPos.RIGHT, new_y=YPos.TOP, align='R')
-            self.ln(15)
-    
-    def footer(self):
-        if self.page_no() > 1:
-            self.set_y(-20)
-            self.set_draw_color(226, 232, 240)
-            self.line(20, 275, 190, 275)
-            
-            self.set_y(-15)
-            self.set_font('helvetica', '', 8)
-            self.set_text_color(148, 163, 184)  # Slate-400
-            self.cell(0, 10, f'Page {self.page_no()}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
-            self.set_text_color(0, 0, 0)
-    
-    def add_cover_page(self):
-        self.add_page()
-        
-        # Geometric Background
-        self.set_fill_color(99, 102, 241)  # Indigo-500
-        self.rect(0, 0, 210, 297, 'F')
-        
-        # White Content Card
-        self.set_fill_color(255, 255, 255)
-        self.rect(20, 40, 170, 217, 'F')
-        
-        # Decorative Accent
-        self.set_fill_color(79, 70, 229)  # Indigo-600
-        self.rect(20, 40, 170, 10, 'F')
-        
-        # Content
-        self.set_y(80)
-        self.set_text_color(30, 41, 59)  # Slate-800
-        self.set_font('helvetica', 'B', 32)
-        self.multi_cell(0, 14, 'MARKET\nRESEARCH\nREPORT', 0, 'C')
-        
-        self.ln(20)
-        self.set_draw_color(99, 102, 241)
-        self.set_line_width(1)
-        self.line(70, self.get_y(), 140, self.get_y())
-        
-        self.ln(20)
-        self.set_font('helvetica', '', 16)
-        self.set_text_color(71, 85, 105)  # Slate-600
-        self.multi_cell(0, 10, self.topic, 0, 'C')
-        
-        # Footer Info
-        self.set_y(220)
-        self.set_font('helvetica', 'B', 10)
-        self.set_text_color(148, 163, 184)
-        self.cell(0, 6, 'PREPARED BY', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-        self.set_font('helvetica', '', 12)
-        self.set_text_color(30, 41, 59)
-        self.cell(0, 8, 'AI Market Agents System', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-        self.ln(2)
-        self.set_font('helvetica', '', 10)
-        self.set_text_color(100, 116, 139)
-        self.cell(0, 6, datetime.now().strftime('%B %d, %Y'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-
-def export_pdf(markdown_content, chart_paths, topic="Market Research"):
-    if not markdown_content:
-        return None
-    
-    # Sanitize text
-    replacements = {
-        '\u2018': "'", '\u2019': "'",
-        '\u201c': '"', '\u201d': '"',
-        '\u2013': '-', '\u2014': '-',
-        '\u2026': '...',
-        '\u00a0': ' ',
-    }
-    for old, new in replacements.items():
-        markdown_content = markdown_content.replace(old, new)
-    
-    pdf = ReportPDF(topic)
-    pdf.add_cover_page()
-    pdf.add_page()
-    
-    # Executive Summary Styling
-    pdf.set_font('helvetica', 'B', 14)
-    pdf.set_text_color(79, 70, 229)  # Indigo-600
-    pdf.cell(0, 10, 'EXECUTIVE SUMMARY', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-    pdf.ln(2)
-    
-    # Parse content
-    sections = markdown_content.split('##')
-    
-    for i, section in enumerate(sections):
-        if not section.strip(): continue
-        
-        if i == 0:  # Intro/Exec Summary
-            pdf.set_font('helvetica', '', 11)
-            pdf.set_text_color(51, 65, 85)  # Slate-700
-            
-            safe_text = section.strip().encode('latin-1', 'replace').decode('latin-1')
-            import re
-            safe_text = re.sub(r'!\[.*?\]\(.*?\)', '', safe_text)
-            pdf.multi_cell(0, 6, safe_text)
-            pdf.ln(10)
-        else:
-            lines = section.strip().split('\n', 1)
-            section_title = lines[0].strip()
-            section_content = lines[1] if len(lines) > 1 else ""
-            
-            if 'Visualizations' in section_title or 'visualization' in section_title.lower():
-                continue
-            
-            # Section Header
-            if pdf.get_y() > 250: pdf.add_page()
-            
-            pdf.set_font('helvetica', 'B', 14)
-            pdf.set_text_color(79, 70, 229)
-            pdf.cell(0, 10, section_title.upper(), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-            pdf.set_draw_color(226, 232, 240)
-            pdf.line(20, pdf.get_y(), 190, pdf.get_y())
-            pdf.ln(5)
-            
-            # Content
-            pdf.set_font('helvetica', '', 11)
-            pdf.set_text_color(51, 65, 85)
-            safe_text = section_content.strip().encode('latin-1', 'replace').decode('latin-1')
-            safe_text = re.sub(r'!\[.*?\]\(.*?\)', '', safe_text)
-            pdf.multi_cell(0, 6, safe_text)
-            pdf.ln(8)
-    
-    # Visualizations Section
-    if chart_paths:
-        pdf.add_page()
-        pdf.set_font('helvetica', 'B', 14)
-        pdf.set_text_color(79, 70, 229)
-        pdf.cell(0, 10, 'DATA VISUALIZATIONS', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.line(20, pdf.get_y(), 190, pdf.get_y())
-        pdf.ln(10)
-        
-        for idx, chart_path in enumerate(chart_paths):
-            if os.path.exists(chart_path):
-                if pdf.get_y() > 180: pdf.add_page()
-                
-                pdf.set_font('helvetica', 'B', 10)
-                pdf.set_text_color(100, 116, 139)
-                pdf.cell(0, 8, f'Figure {idx + 1}: Market Analysis Chart', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-                
-                try:
-                    img_width = 170
-                    x_pos = (pdf.w - img_width) / 2
-                    pdf.image(chart_path, x=x_pos, w=img_width)
-                    pdf.ln(10)
-                except Exception as e:
-                    print(f"Error adding chart: {e}")
-    
-    output_filename = "report.pdf"
-    try:
-        pdf.output(output_filename)
-    except Exception as e:
-        print(f"Failed to save PDF: {e}")
-        return None
-    
-    return output_filename
-
-import json
-import shutil
-from datetime import datetime
-
-class HistoryManager:
-    def __init__(self, history_dir="history"):
-        self.history_dir = history_dir
-        if not os.path.exists(history_dir):
-            os.makedirs(history_dir)
-            
-    def save_report(self, topic, report_content, chart_paths, pdf_path):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_topic = "".join([c for c in topic if c.isalnum() or c in (' ', '-', '_')]).strip().replace(' ', '_')
-        report_id = f"{timestamp}_{safe_topic}"
-        report_dir = os.path.join(self.history_dir, report_id)
-        
-        os.makedirs(report_dir)
-        
-        # Save metadata
-        metadata = {
-            "id": report_id,
-            "topic": topic,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "charts": [],
-            "pdf": "report.pdf" if pdf_path else None
-        }
-        
-        # Save report content
-        with open(os.path.join(report_dir, "report.md"), "w", encoding="utf-8") as f:
-            f.write(report_content)
-            
-        # Copy charts
-        for chart_path in chart_paths:
-            if os.path.exists(chart_path):
-                chart_name = os.path.basename(chart_path)
-                shutil.copy2(chart_path, os.path.join(report_dir, chart_name))
-                metadata["charts"].append(chart_name)
-                
-        # Copy PDF
-        if pdf_path and os.path.exists(pdf_path):
-            shutil.copy2(pdf_path, os.path.join(report_dir, "report.pdf"))
-            
-        # Save metadata json
-        with open(os.path.join(report_dir, "metadata.json"), "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=4)
-            
-        return report_id
-
-    def get_history(self):
-        reports = []
-        if not os.path.exists(self.history_dir):
-            return []
-            
-        for report_id in os.listdir(self.history_dir):
-            meta_path = os.path.join(self.history_dir, report_id, "metadata.json")
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        meta = json.load(f)
-                        reports.append(meta)
-                except:
-                    continue
-        
-        # Sort by date descending
-        return sorted(reports, key=lambda x: x["id"], reverse=True)
-
-    def load_report(self, report_id):
-        report_dir = os.path.join(self.history_dir, report_id)
-        if not os.path.exists(report_dir):
-            return None
-            
-        # Load content
-        with open(os.path.join(report_dir, "report.md"), "r", encoding="utf-8") as f:
-            content = f.read()
-            
-        # Load metadata
-        with open(os.path.join(report_dir, "metadata.json"), "r", encoding="utf-8") as f:
-            meta = json.load(f)
-            
-        # Get chart paths
-        chart_paths = [os.path.join(report_dir, c) for c in meta["charts"]]
-        pdf_path = os.path.join(report_dir, "report.pdf") if meta["pdf"] else None
-        
-        return content, chart_paths, pdf_path
-
 def create_timeline_html(completed_steps, current_step=None):
     """Generate HTML for timeline progress visualization"""
     all_steps = ["researcher", "analyst", "reviewer", "chart_generator", "writer"]
@@ -327,111 +71,243 @@ def create_timeline_html(completed_steps, current_step=None):
     """
     return html
 
-history_manager = HistoryManager()
+history_manager = HistoryManager(os.getenv("HISTORY_DIR", "history"))
+
+# Number of most recent reports listed in the history dropdown
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+
+def history_choices():
+    return [(f"{h['date']} - {h['topic']}", h["id"]) for h in history_manager.get_history(limit=HISTORY_PAGE_SIZE)]
+
+def search_history(query):
+    # An empty box goes back to the most recent reports
+    if not query or not query.strip():
+        return gr.update(choices=history_choices(), value=None)
+    results = history_manager.search(query, limit=HISTORY_PAGE_SIZE)
+    choices = [(f"{h['date']} - {h['topic']}", h["id"]) for h in results]
+    return gr.update(choices=choices, value=choices[0][1] if choices else None)
+
+def chart_gallery(report, chart_paths):
+    # Caption each chart with the description the writer embedded it with
+    captions = parse_report(report or "").image_captions()
+    return [(path, captions.get(os.path.basename(path))) for path in chart_paths]
+
+TRACE_PLACEHOLDER = "*Time, tokens and cost per agent step will appear here...*"
+
+def trace_markdown(path):
+    return format_trace_summary(summarize_trace(load_trace(path)))
+
+# Minimum seconds between streamed report updates pushed to the browser
+STREAM_UPDATE_INTERVAL = float(os.getenv("STREAM_UPDATE_INTERVAL", 0.25))
 
-def generate_report(topic, provider):
+async def generate_report(topic, provider, force_refresh=False):
+    pending_brief = None
     try:
-        graph = MarketResearchGraph(model_provider=provider.lower())
+        graph = get_graph(provider.lower())
+        workspace = Workspace()
         completed_steps = []
+        chart_paths = []
+        streamed = {}
+        stream_ids = {}
+        report_preview = ""
+        last_flush = 0.0
         
         # Initial state
         initial_html = create_timeline_html([], None)
-        yield initial_html, "", [], None, gr.Button(value="Agents Working ⏳", interactive=False, variant="secondary"), gr.update(choices=[])
+        yield initial_html, "", [], None, gr.Button(value="Agents Working ⏳", interactive=False, variant="secondary"), gr.update(choices=[]), None, TRACE_PLACEHOLDER
         
-        for step_name, step_output in graph.run_stream(topic):
-            if step_name not in completed_steps:
+        all_steps = ["researcher", "analyst", "reviewer", "chart_generator", "writer"]
+        async for step_name, step_output in graph.arun_stream(topic, force_refresh, workspace, stream_tokens=True):
+            if step_name == TOKEN_EVENT:
+                node = step_output["node"]
+                # A new message means the call was retried, drop the partial text it replaces
+                if stream_ids.get(node) != step_output.get("message_id"):
+                    stream_ids[node] = step_output.get("message_id")
+                    streamed[node] = ""
+                streamed[node] = streamed.get(node, "") + step_output["content"]
+                # Show the writer's draft as it arrives, or the analyst's until the writer starts
+                report_preview = streamed.get("writer") or streamed.get("analyst", "")
+                now = time.monotonic()
+                if now - last_flush >= STREAM_UPDATE_INTERVAL:
+                    last_flush = now
+                    yield gr.update(), report_preview, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+                continue
+            
+            if step_name == "analyst":
+                # A revision starts a fresh analysis stream
+                streamed.pop("analyst", None)
+            
+            if step_name in all_steps and step_name not in completed_steps:
                 completed_steps.append(step_name)
             
-            # Find all chart files
-            chart_paths = [f for f in os.listdir() if f.startswith("chart_") and f.endswith(".png")]
-            chart_paths.sort()
+            if step_name == "writer" and AUDIO_PREGENERATE:
+                pending_brief = start_audio_brief(step_output.get("final_report", ""))
+            
+            # Charts come from this run's state, never from a directory scan
+            if step_name == "chart_generator":
+                chart_paths = step_output.get("chart_files", [])
             
             # Determine next step
-            all_steps = ["researcher", "analyst", "reviewer", "chart_generator", "writer"]
             try:
                 current_idx = all_steps.index(step_name)
                 next_step = all_steps[current_idx + 1] if current_idx < len(all_steps) - 1 else None
             except ValueError:
                 next_step = None
             
+            # Chart generation and writing run side by side, point at whichever is still going
+            if step_name in ("chart_generator", "writer"):
+                remaining = [s for s in ("chart_generator", "writer") if s not in completed_steps]
+                next_step = remaining[0] if remaining else None
+            
             # If reviewer sends back to researcher, reset completed steps partially or just show status
             if step_name == "reviewer" and step_output.get("feedback"):
                 # Loop detected
                 next_step = "researcher"
             
             timeline_html = create_timeline_html(completed_steps, next_step)
-            yield timeline_html, "", chart_paths, None, gr.Button(value="Agents Working ⏳", interactive=False, variant="secondary"), gr.update()
+            yield timeline_html, report_preview, chart_paths, None, gr.Button(value="Agents Working ⏳", interactive=False, variant="secondary"), gr.update(), gr.update(), await asyncio.to_thread(trace_markdown, workspace.file(TRACE_FILE))
             
-            if step_name == "writer":
+            if step_name == "finalize":
                 final_report = step_output.get("final_report", "")
-                # Generate PDF with topic
-                pdf_path = export_pdf(final_report, chart_paths, topic)
                 
-                # Save to history
-                history_manager.save_report(topic, final_report, chart_paths, pdf_path)
+                # Save to history and serve the archived copies so the workspace can go.
+                # The PDF is only built when someone asks for it (see prepare_pdf).
+                report_id = await asyncio.to_thread(history_manager.save_report, topic, final_report, chart_paths, trace_path=workspace.file(TRACE_FILE))
+                if pending_brief:
+                    task = asyncio.create_task(store_audio_brief(report_id, *pending_brief))
+                    background_tasks.add(task)
+                    task.add_done_callback(background_tasks.discard)
+                _, chart_paths, _ = await asyncio.to_thread(history_manager.load_report, report_id)
+                trace_summary = await asyncio.to_thread(trace_markdown, workspace.file(TRACE_FILE))
+                await asyncio.to_thread(workspace.cleanup)
                 
                 # Update history list
-                history = history_manager.get_history()
-                history_choices = [f"{h['date']} - {h['topic']}" for h in history]
+                choices = await asyncio.to_thread(history_choices)
                 
                 final_timeline = create_timeline_html(completed_steps, None)
-                yield final_timeline, final_report, chart_paths, pdf_path, gr.Button(value="Generate Report", interactive=True, variant="primary"), gr.update(choices=history_choices, value=history_choices[0] if history_choices else None)
+                yield final_timeline, final_report, chart_gallery(final_report, chart_paths), None, gr.Button(value="Generate Report", interactive=True, variant="primary"), gr.update(choices=choices, value=report_id), report_id, trace_summary
                 
     except Exception as e:
+        if pending_brief:
+            # The report was never saved, so there is nowhere to store the brief
+            key, future = pending_brief
+            future.add_done_callback(lambda _: release_audio_brief(key, future))
         error_html = f'<div style="color: red; padding: 20px;">Error: {str(e)}</div>'
-        yield error_html, "", [], None, gr.Button(value="Generate Report", interactive=True, variant="primary"), gr.update()
+        yield error_html, "", [], None, gr.Button(value="Generate Report", interactive=True, variant="primary"), gr.update(), None, gr.update()
 
-def load_history_report(selection):
-    if not selection:
-        return None, None, None, None
+def load_history_report(report_id):
+    if not report_id:
+        return None, None, None, None, None, TRACE_PLACEHOLDER
         
-    # Parse selection to get topic and date to find ID (simplified matching)
-    history = history_manager.get_history()
-    selected_report = None
-    for h in history:
-        if f"{h['date']} - {h['topic']}" == selection:
-            selected_report = h
-            break
-            
-    if selected_report:
-        content, chart_paths, pdf_path = history_manager.load_report(selected_report["id"])
+    # The dropdown value is the report ID, so this is a direct index lookup
+    loaded = history_manager.load_report(report_id)
+    if loaded:
+        content, chart_paths, pdf_path = loaded
         # Re-create timeline as completed
         timeline = create_timeline_html(["researcher", "analyst", "reviewer", "chart_generator", "writer"], None)
-        return timeline, content, chart_paths, pdf_path
+        return timeline, content, chart_gallery(content, chart_paths), pdf_path, report_id, trace_markdown(history_manager.trace_path(report_id))
     
-    return None, None, None, None
+    return None, None, None, None, None, TRACE_PLACEHOLDER
 
-from openai import OpenAI
+async def prepare_pdf(report_id):
+    """Build the PDF of a saved report on first download and keep it in the history."""
+    if not report_id:
+        return None
+    meta = await asyncio.to_thread(history_manager.get_report, report_id)
+    loaded = await asyncio.to_thread(history_manager.load_report, report_id)
+    if meta is None or loaded is None:
+        return None
+    content, chart_paths, pdf_path = loaded
+    if pdf_path and os.path.exists(pdf_path):
+        return pdf_path
+    
+    # fpdf is only needed here (and in the PDF workers), not to start the app
+    from src.pdf import abuild_pdf
+    date = datetime.strptime(meta["date"], "%Y-%m-%d %H:%M:%S")
+    try:
+        pdf_data = await abuild_pdf(content, chart_paths, meta["topic"], date)
+    except Exception as e:
+        print(f"Error exporting PDF for {report_id}: {e}")
+        return None
+    if not pdf_data:
+        return None
+    return await asyncio.to_thread(history_manager.save_pdf, report_id, pdf_data)
+
+# Start the audio brief as soon as the writer is done instead of waiting for the button
+AUDIO_PREGENERATE = os.getenv("AUDIO_PREGENERATE", "false").lower() in ("1", "true", "yes")
+audio_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AUDIO_WORKERS", 2)))
+# Briefs being synthesized, by audio key, so a button press never starts a second TTS call
+pending_audio = {}
+# Keeps fire-and-forget tasks referenced until they finish
+background_tasks = set()
 
-def generate_audio_summary(report_text):
-    if not report_text:
+def start_audio_brief(report_text):
+    summary = extract_summary(report_text)
+    if not summary:
         return None
-        
+    key = audio_key(summary)
+    future = pending_audio.get(key)
+    if future is None:
+        print("--- Audio: Generating brief in the background ---")
+        future = audio_executor.submit(synthesize, summary)
+        pending_audio[key] = future
+    return key, future
+
+def release_audio_brief(key, future):
+    # Only called once the brief is in the history (or cannot get there), so a click
+    # in between still finds the pending future instead of paying for a second TTS call
+    if pending_audio.get(key) is future:
+        pending_audio.pop(key, None)
+
+async def store_audio_brief(report_id, key, future):
     try:
-        # Extract Executive Summary
-        summary = ""
-        if "## Executive Summary" in report_text:
-            summary = report_text.split("## Executive Summary")[1].split("##")[0].strip()
-        else:
-            summary = report_text[:1000] # Fallback to first 1000 chars
-            
-        # Initialize OpenAI client
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
-            input=f"Here is your market research executive summary. {summary}"
-        )
+        audio_data = await asyncio.wrap_future(future)
+        await asyncio.to_thread(history_manager.save_audio, report_id, key, audio_data)
+    except Exception as e:
+        print(f"Error generating audio: {e}")
+    finally:
+        release_audio_brief(key, future)
+
+def generate_audio_summary(report_id):
+    if not report_id:
+        yield None
+        return
+    loaded = history_manager.load_report(report_id)
+    if not loaded:
+        yield None
+        return
+    
+    summary = extract_summary(loaded[0])
+    key = audio_key(summary)
+    
+    # Briefs are cached in the history by a hash of the summary and voice
+    cached = history_manager.get_audio(report_id, key)
+    if cached:
+        yield cached
+        return
+    
+    try:
+        future = pending_audio.get(key)
+        if future is not None:
+            try:
+                audio_data = future.result()
+                yield history_manager.save_audio(report_id, key, audio_data)
+            finally:
+                release_audio_brief(key, future)
+            return
         
-        output_path = "summary.mp3"
-        response.stream_to_file(output_path)
-        return output_path
+        # Play the brief while it is still being synthesized
+        chunks = []
+        for chunk in stream_speech(summary):
+            chunks.append(chunk)
+            yield chunk
+        history_manager.save_audio(report_id, key, b"".join(chunks))
     except Exception as e:
         print(f"Error generating audio: {e}")
-        return None
 
 def app():
+    cleanup_stale_workspaces()
+    
     # Custom theme configuration
     theme = gr.themes.Ocean(
         primary_hue="indigo",
@@ -731,6 +607,9 @@ def app():
     """
 
     with gr.Blocks(theme=theme, css=css, title="Market Research Agents") as demo:
+        # ID of the report on screen, used to build its PDF on demand
+        current_report = gr.State(None)
+        
         with gr.Column(elem_classes="container"):
             # Header
             with gr.Column(elem_classes="header"):
@@ -742,9 +621,14 @@ def app():
                 with gr.Column(scale=1, min_width=300):
                     with gr.Column(elem_classes="glass-card"):
                         gr.Markdown("### 📂 Report History")
+                        history_search = gr.Textbox(
+                            placeholder="Search past reports...",
+                            show_label=False,
+                            info="Full-text search over topics and report contents"
+                        )
                         history_dropdown = gr.Dropdown(
                             label="Previous Reports",
-                            choices=[f"{h['date']} - {h['topic']}" for h in history_manager.get_history()],
+                            choices=history_choices(),
                             interactive=True,
                             info="Select a past report to view",
                             show_label=False
@@ -773,6 +657,12 @@ def app():
                                 info="Select your preferred AI engine"
                             )
                         
+                        refresh_input = gr.Checkbox(
+                            label="Force fresh research",
+                            value=False,
+                            info="Ignore cached searches and LLM responses and run every call again"
+                        )
+                        
                         submit_btn = gr.Button(
                             "Generate Comprehensive Report", 
                             variant="primary", 
@@ -795,9 +685,10 @@ def app():
                             with gr.Column(scale=1):
                                 with gr.Group(elem_classes="glass-card"):
                                     gr.Markdown("### 📥 Exports")
+                                    pdf_btn = gr.Button("Prepare PDF 📄", variant="secondary")
                                     pdf_download = gr.File(label="Download PDF", show_label=False)
                                     audio_btn = gr.Button("Generate Audio Brief 🎧", variant="secondary")
-                                    audio_output = gr.Audio(label="Podcast Summary", type="filepath", show_label=False)
+                                    audio_output = gr.Audio(label="Podcast Summary", type="filepath", show_label=False, streaming=True, autoplay=True)
 
                         # Content Tabs
                         with gr.Tabs(elem_classes="tabs"):
@@ -817,23 +708,37 @@ def app():
                                     show_label=False
                                 )
                             with gr.TabItem("🔍 Raw Data", elem_id="tab-data"):
-                                gr.Markdown("*Raw research data and analysis logs will appear here...*")
+                                trace_output = gr.Markdown(TRACE_PLACEHOLDER)
 
             submit_btn.click(
                 fn=generate_report,
-                inputs=[topic_input, provider_input],
-                outputs=[status_output, output_display, chart_output, pdf_download, submit_btn, history_dropdown]
+                inputs=[topic_input, provider_input, refresh_input],
+                outputs=[status_output, output_display, chart_output, pdf_download, submit_btn, history_dropdown, current_report, trace_output],
+                concurrency_limit=int(os.getenv("MAX_CONCURRENT_REPORTS", 32))
+            )
+            
+            history_search.change(
+                fn=search_history,
+                inputs=[history_search],
+                outputs=[history_dropdown],
+                trigger_mode="always_last"
             )
             
             load_btn.click(
                 fn=load_history_report,
                 inputs=[history_dropdown],
-                outputs=[status_output, output_display, chart_output, pdf_download]
+                outputs=[status_output, output_display, chart_output, pdf_download, current_report, trace_output]
+            )
+            
+            pdf_btn.click(
+                fn=prepare_pdf,
+                inputs=[current_report],
+                outputs=[pdf_download]
             )
             
             audio_btn.click(
                 fn=generate_audio_summary,
-                inputs=[output_display],
+                inputs=[current_report],
                 outputs=[audio_output]
             )
 
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from src.history import HistoryManager
+from src.registry import get_graph
+from src.tools.rate_limit import rate_limit_stats
+from src.tracing import TRACE_FILE
+from src.workspace import Workspace, cleanup_stale_workspaces
+
+PROVIDERS = ("gemini", "openai")
+
+
+def load_topics(path, default_provider):
+    """Read (topic, provider) pairs from a JSONL file, one object or string per line."""
+    topics = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping line {line_no}: not valid JSON")
+                continue
+            if isinstance(item, str):
+                item = {"topic": item}
+            topic = str(item.get("topic") or item.get("title") or "").strip()
+            if not topic:
+                print(f"Skipping line {line_no}: no topic")
+                continue
+            provider = str(item.get("provider") or default_provider).lower()
+            if provider not in PROVIDERS:
+                print(f"Skipping line {line_no}: unknown provider {provider!r}")
+                continue
+            # The same topic listed twice would only produce two identical reports
+            key = (topic.lower(), provider)
+            if key in seen:
+                continue
+            seen.add(key)
+            topics.append((topic, provider))
+    return topics
+
+
+def provider_limit(provider, default):
+    name = f"BATCH_CONCURRENCY_{provider.upper()}"
+    limit = int(os.getenv(name, default))
+    # A semaphore of 0 would leave every topic of the provider waiting forever
+    if limit < 1:
+        raise ValueError(f"{name} must be at least 1, got {limit}")
+    return limit
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_topic(topic, provider, history_manager, limits, force_refresh):
+    """Generate one report and archive it, holding the provider's slot while the graph runs."""
+    async with limits[provider]:
+        started = time.monotonic()
+        print(f"--- BATCH: Starting '{topic}' ({provider}) ---")
+        graph = get_graph(provider)
+        workspace = Workspace()
+        try:
+            state = await graph.arun(topic, force_refresh, workspace)
+        except Exception:
+            workspace.cleanup()
+            raise
+        elapsed = time.monotonic() - started
+
+    # Archiving does not need the provider, so the next topic can start. PDFs are
+    # built on first download, not for every report in the batch.
+    try:
+        final_report = state.get("final_report", "")
+        chart_paths = state.get("chart_files", [])
+        report_id = await asyncio.to_thread(
+            history_manager.save_report, topic, final_report, chart_paths, trace_path=workspace.file(TRACE_FILE)
+        )
+    finally:
+        workspace.cleanup()
+    return report_id, elapsed
+
+
+async def run_batch(topics, history_manager, concurrency, max_age, force_refresh):
+    limits = {provider: asyncio.Semaphore(provider_limit(provider, concurrency)) for provider in PROVIDERS}
+    results = {"done": [], "skipped": [], "failed": []}
+
+    async def worker(topic, provider):
+        if max_age is not None and not force_refresh:
+            existing = await asyncio.to_thread(history_manager.latest_report, topic, max_age)
+            if existing:
+                print(f"--- BATCH: Skipping '{topic}', report {existing['id']} is fresh ---")
+                results["skipped"].append(topic)
+                return
+        try:
+            report_id, elapsed = await run_topic(topic, provider, history_manager, limits, force_refresh)
+        except Exception as e:
+            print(f"--- BATCH: Failed '{topic}': {e} ---")
+            results["failed"].append(topic)
+            return
+        print(f"--- BATCH: Saved '{topic}' as {report_id} in {elapsed:.1f}s ---")
+        results["done"].append(elapsed)
+
+    await asyncio.gather(*(worker(topic, provider) for topic, provider in topics))
+    return results
+
+
+def print_summary(results, wall_time):
+    latencies = results["done"]
+    print("\n--- BATCH SUMMARY ---")
+    print(f"Generated: {len(latencies)}  Skipped: {len(results['skipped'])}  Failed: {len(results['failed'])}")
+    print(f"Wall time: {wall_time:.1f}s")
+    if latencies:
+        print(f"Throughput: {len(latencies) / wall_time * 3600:.1f} reports/hour")
+        print(
+            f"Latency: p50 {percentile(latencies, 50):.1f}s  p95 {percentile(latencies, 95):.1f}s  "
+            f"max {max(latencies):.1f}s"
+        )
+    # Time spent waiting for quota shows whether the RATE_LIMIT_* budgets are the bottleneck
+    for name, stats in rate_limit_stats().items():
+        print(
+            f"Rate limit {name}: {stats['calls']} calls, {stats['throttled']} throttled, "
+            f"waited {stats['wait_total']:.1f}s (p95 {stats['wait_p95']:.1f}s), "
+            f"{stats['rate_limited']} rate-limited, {stats['retries']} retries"
+        )
+    for topic in results["failed"]:
+        print(f"Failed: {topic}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate market research reports for a list of topics")
+    parser.add_argument("topics", help="JSONL file with one topic per line ({\"topic\": ...} or a JSON string)")
+    parser.add_argument("--provider", default="gemini", choices=PROVIDERS, help="provider for lines that do not name one")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", 4)),
+                        help="reports generated at once per provider (BATCH_CONCURRENCY_<PROVIDER> overrides)")
+    parser.add_argument("--max-age", type=float, default=float(os.getenv("BATCH_FRESH_HOURS", 24)),
+                        help="skip topics with a report younger than this many hours (0 disables)")
+    parser.add_argument("--force", action="store_true", help="ignore existing reports and cached research")
+    parser.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "history"))
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    try:
+        for provider in PROVIDERS:
+            provider_limit(provider, args.concurrency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    topics = load_topics(args.topics, args.provider)
+    if not topics:
+        print("No topics to run")
+        return
+
+    cleanup_stale_workspaces()
+    history_manager = HistoryManager(args.history_dir)
+    max_age = args.max_age * 3600 if args.max_age > 0 else None
+
+    print(f"--- BATCH: {len(topics)} topics, up to {args.concurrency} at once per provider ---")
+    started = time.monotonic()
+    results = asyncio.run(run_batch(topics, history_manager, args.concurrency, max_age, args.force))
+    print_summary(results, time.monotonic() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Stand-in LLM and search backends for benchmarking the pipeline offline."""
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+FILLER = (
+    "Demand kept growing as buyers consolidated vendors, while new entrants pushed prices down "
+    "and incumbents invested in distribution to defend their share. "
+)
+
+
+def _text(chars):
+    return (FILLER * (chars // len(FILLER) + 1))[:chars]
+
+
+class _Backend:
+    def __init__(self, latency=0.0, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _delay(self):
+        with self._lock:
+            self.calls += 1
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _random_value(self, fn):
+        with self._lock:
+            return fn(self._random)
+
+
+class FakeLLM(_Backend):
+    """Answers each agent prompt with a plausible response after a simulated delay.
+
+    The reviewer rejects with probability reject_rate, chart prompts get random chart
+    specs (so renders are not served from the chart cache), and responses carry
+    usage_metadata like the real chat models.
+    """
+
+    temperature = 0.0
+
+    def __init__(self, latency=0.5, jitter=0.0, response_chars=3000, reject_rate=0.0, charts=2, seed=0):
+        super().__init__(latency, jitter, seed)
+        self.response_chars = response_chars
+        self.reject_rate = reject_rate
+        self.charts = charts
+
+    def _chart_specs(self):
+        charts = []
+        for idx in range(self.charts):
+            values = self._random_value(lambda rng: [round(rng.uniform(10, 100), 1) for _ in range(4)])
+            charts.append({
+                "type": "bar" if idx % 2 == 0 else "line",
+                "title": f"Market indicator {idx + 1}",
+                "labels": ["2022", "2023", "2024", "2025"],
+                "series": [{"name": "Value", "values": values}],
+                "unit": "USD bn",
+            })
+        return json.dumps({"charts": charts})
+
+    def _report(self):
+        embeds = "\n\n".join(f"![Indicator {idx + 1}](chart_{idx + 1}.png)" for idx in range(self.charts))
+        body = _text(self.response_chars)
+        return (
+            f"# Market Research Report\n\n## Executive Summary\n\n{body[:500]}\n\n"
+            f"## Key Trends\n\n{body}\n\n{embeds}\n\n## Conclusion\n\n{body[:300]}"
+        )
+
+    def answer(self, prompt):
+        if "Review the following" in prompt:
+            rejected = self._random_value(lambda rng: rng.random() < self.reject_rate)
+            return "REJECTED Needs more specific market size data" if rejected else "APPROVED"
+        if "describe up to 3 relevant charts" in prompt:
+            return self._chart_specs()
+        if "generate Python code using matplotlib" in prompt:
+            return "import matplotlib.pyplot as plt\nplt.bar(['a', 'b'], [1, 2])\nplt.savefig(os.path.join(OUTPUT_DIR, 'chart_1.png'))"
+        if "Write a comprehensive market research report" in prompt:
+            return self._report()
+        return _text(self.response_chars)
+
+    def _response(self, prompt):
+        content = self.answer(prompt)
+        input_tokens, output_tokens = len(prompt) // 4, len(content) // 4
+        return SimpleNamespace(
+            content=content,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        )
+
+    def invoke(self, messages):
+        time.sleep(self._delay())
+        return self._response(messages[-1].content)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self._delay())
+        return self._response(messages[-1].content)
+
+
+class FakeSearch(_Backend):
+    def __init__(self, latency=0.3, jitter=0.0, response_chars=4000, seed=0):
+        super().__init__(latency, jitter, seed)
+        self.response_chars = response_chars
+
+    def _result(self, query):
+        return f"Results for {query}. " + _text(self.response_chars)
+
+    def invoke(self, query):
+        time.sleep(self._delay())
+        return self._result(query)
+
+    async def ainvoke(self, query):
+        await asyncio.sleep(self._delay())
+        return self._result(query)
@@ -0,0 +1,90 @@
+"""Check cold import times and deferred dependencies against a budget.
+
+Run from market_agents/:  python benchmarks/import_time.py
+
+Every module is imported in a fresh interpreter. The check fails (exit code 1)
+when an import takes longer than its budget, or when it pulls in a dependency
+that is meant to load on first use. Time budgets depend on the machine, so scale
+them with --scale on slow CI runners. The dependency check does not depend on
+the machine.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MARKET_AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use: LLM clients when a graph is built, langgraph when it is
+# compiled, matplotlib in the chart workers, fpdf in the PDF workers, openai for TTS.
+DEFERRED = ("langchain_openai", "langchain_google_genai", "langgraph", "langchain_community", "matplotlib", "fpdf", "openai")
+
+# module: (budget in seconds, dependencies that must not be imported with it)
+IMPORT_BUDGETS = {
+    "src.graph": (0.5, DEFERRED),
+    "src.registry": (0.5, DEFERRED),
+    "src.history": (0.3, DEFERRED),
+    "src.audio": (0.3, DEFERRED),
+    "src.tools.cassette": (0.3, DEFERRED),
+    "batch": (0.5, DEFERRED),
+    # The UI needs gradio, everything else is deferred
+    "app": (6.0, DEFERRED),
+}
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure(module, runs, scratch):
+    best, modules = None, []
+    for _ in range(runs):
+        # A scratch working directory keeps the app from creating history/ in the tree
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=scratch, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [MARKET_AGENTS_DIR, os.getenv("PYTHONPATH")]))),
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or data["seconds"] < best:
+            best, modules = data["seconds"], data["modules"]
+    return best, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("modules", nargs="*", help="modules to check (default: all budgeted modules)")
+    parser.add_argument("--runs", type=int, default=3, help="imports per module, the fastest counts")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", 1.0)),
+                        help="multiply every time budget, for slow machines")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        for module in args.modules or IMPORT_BUDGETS:
+            budget, deferred = IMPORT_BUDGETS.get(module, (None, DEFERRED))
+            seconds, modules = measure(module, args.runs, scratch)
+            loaded = sorted({name.split(".")[0] for name in modules} & set(deferred))
+            over = budget is not None and seconds > budget * args.scale
+            status = "FAIL" if over or loaded else "ok"
+            failures += status == "FAIL"
+            limit = f"{budget * args.scale:.2f}s" if budget is not None else "-"
+            print(f"{status:<5} {module:<22} {seconds:6.2f}s (budget {limit}, {len(modules)} modules)")
+            if loaded:
+                print(f"      loads deferred dependencies: {', '.join(loaded)}")
+
+    if failures:
+        print(f"{failures} module(s) over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Time PDF export of a large synthetic report.
+
+Run from market_agents/:  python benchmarks/pdf_export.py --sections 400
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from src.audio import extract_summary
+from src.document import ReportDocument, parse_report
+from src.pdf import build_pdf
+
+PARAGRAPH = (
+    "The market grew 12% year over year as enterprise buyers consolidated vendors. "
+    "Pricing pressure from new entrants kept margins flat, while the leading players "
+    "invested in distribution and support to defend their share. "
+)
+
+
+def make_charts(directory, count):
+    paths = []
+    for idx in range(count):
+        fig, ax = plt.subplots(figsize=(10, 6), dpi=150)
+        ax.plot(range(50), [(x * (idx + 1)) % 17 for x in range(50)])
+        path = os.path.join(directory, f"chart_{idx + 1}.png")
+        fig.savefig(path)
+        plt.close(fig)
+        paths.append(path)
+    return paths
+
+
+def make_report(sections, chart_paths):
+    parts = ["# Market Research Report", PARAGRAPH * 3, "## Executive Summary", PARAGRAPH * 4]
+    for idx in range(sections):
+        parts.append(f"## Section {idx + 1}: Segment “Analysis”")
+        parts.append(PARAGRAPH * 6)
+        parts.append("### Key Drivers\n- Demand — steady\n- Supply – constrained")
+        if chart_paths and idx % 10 == 0:
+            chart = chart_paths[(idx // 10) % len(chart_paths)]
+            parts.append(f"![Segment {idx + 1} trend]({os.path.basename(chart)})")
+    return "\n\n".join(parts)
+
+
+def timed(fn, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, samples
+
+
+def report(label, samples):
+    print(f"{label:<28} median {statistics.median(samples) * 1000:9.1f} ms   min {min(samples) * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report parsing and PDF export")
+    parser.add_argument("--sections", type=int, default=400, help="report sections (~4 per page)")
+    parser.add_argument("--charts", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chart_paths = make_charts(tmp, args.charts)
+        markdown = make_report(args.sections, chart_paths)
+        print(f"Report: {args.sections} sections, {len(markdown) / 1024:.0f} KB of markdown, {len(chart_paths)} charts")
+
+        _, samples = timed(lambda: ReportDocument(markdown), args.runs)
+        report("parse (uncached)", samples)
+        parse_report(markdown)
+        _, samples = timed(lambda: parse_report(markdown), args.runs)
+        report("parse (cached)", samples)
+        _, samples = timed(lambda: extract_summary(markdown), args.runs)
+        report("audio summary (cached)", samples)
+
+        pdf_data, samples = timed(lambda: build_pdf(markdown, chart_paths, "Benchmark"), args.runs)
+        report("build_pdf", samples)
+        pages = len(re.findall(rb"/Type\s*/Page\b", pdf_data))
+        print(f"PDF: {pages} pages, {len(pdf_data) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
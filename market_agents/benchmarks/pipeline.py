@@ -0,0 +1,301 @@
+"""Benchmark the report pipeline offline, with stand-in LLM and search backends.
+
+Run from market_agents/:  python benchmarks/pipeline.py --concurrency 1 4 16 --runs 16
+
+Each mode (graph.run, graph.run_stream, app.generate_report) is driven at every
+concurrency level. Latency, throughput, peak RSS and the time spent in each node
+outside the stand-in backends are printed and saved as JSON under
+benchmarks/results/. Pass --compare <results.json> to diff against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fakes import FakeLLM, FakeSearch
+
+MODES = ("run", "stream", "generate_report")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def isolate_state():
+    """Keep workspaces, caches, checkpoints and history of the benchmark in a scratch directory."""
+    scratch = tempfile.mkdtemp(prefix="market_bench_")
+    os.environ["WORKSPACE_DIR"] = os.path.join(scratch, "runs")
+    os.environ["HISTORY_DIR"] = os.path.join(scratch, "history")
+    os.environ["SEARCH_CACHE_PATH"] = os.path.join(scratch, "search.sqlite3")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(scratch, "llm.sqlite3")
+    os.environ["CHECKPOINT_PATH"] = os.path.join(scratch, "checkpoints.sqlite3")
+    os.environ["TRACING"] = "true"
+    return scratch
+
+
+class RSSSampler(threading.Thread):
+    """Track the peak resident set size of this process while a level runs."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def _rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # ru_maxrss is the peak since start, in KB on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, self._rss())
+        return self.peak
+
+
+def _union(intervals):
+    total, end = 0.0, None
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total
+
+
+def node_overhead(spans):
+    """Seconds each node spent outside stand-in LLM and search calls (chart rendering is real work and counts)."""
+    children = {}
+    for span in spans:
+        if span["kind"] in ("llm", "search") and span.get("parent"):
+            children.setdefault(span["parent"], []).append((span["start"], span["start"] + span.get("duration", 0.0)))
+    overhead = {}
+    for span in spans:
+        if span["kind"] == "node":
+            backend = _union(children.get(span["id"], []))
+            overhead[span["name"]] = overhead.get(span["name"], 0.0) + max(0.0, span.get("duration", 0.0) - backend)
+    return overhead
+
+
+def build_graph(args):
+    from src.graph import MarketResearchGraph
+    from src.tools.rate_limit import RateLimiter
+
+    llm = FakeLLM(args.llm_latency, args.jitter, args.response_chars, args.reject_rate, args.charts, args.seed)
+    search = FakeSearch(args.search_latency, args.jitter, args.search_chars, args.seed)
+    # Unlimited limiters: the benchmark measures the pipeline, not the configured quotas
+    return MarketResearchGraph(
+        model_provider="gemini", llm=llm, search_tool=search, research_mode=args.research_mode,
+        llm_limiter=RateLimiter("bench-llm"), search_limiter=RateLimiter("bench-search"),
+    )
+
+
+def drive_graph(graph, topic, stream):
+    from src.tracing import TRACE_FILE, load_trace
+    from src.workspace import Workspace
+
+    workspace = Workspace()
+    started = time.perf_counter()
+    try:
+        if stream:
+            for _ in graph.run_stream(topic, workspace=workspace, stream_tokens=True):
+                pass
+        else:
+            graph.run(topic, workspace=workspace)
+        elapsed = time.perf_counter() - started
+        return elapsed, load_trace(workspace.file(TRACE_FILE))
+    finally:
+        workspace.cleanup()
+
+
+async def drive_app(app, topic):
+    from src.tracing import load_trace
+
+    started = time.perf_counter()
+    outputs = None
+    async for outputs in app.generate_report(topic, "Gemini"):
+        pass
+    elapsed = time.perf_counter() - started
+    report_id = outputs[6] if outputs else None
+    if not report_id:
+        raise RuntimeError(f"generate_report failed: {outputs[0] if outputs else 'no output'}")
+    return elapsed, load_trace(app.history_manager.trace_path(report_id))
+
+
+def run_level(mode, concurrency, runs, graph, app, level_id):
+    topics = [f"Benchmark market {level_id}-{idx}" for idx in range(runs)]
+    outcomes = []
+
+    if mode == "generate_report":
+        async def level():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(topic):
+                async with semaphore:
+                    return await drive_app(app, topic)
+
+            return await asyncio.gather(*(one(topic) for topic in topics), return_exceptions=True)
+
+        outcomes = asyncio.run(level())
+    else:
+        def one(topic):
+            try:
+                return drive_graph(graph, topic, mode == "stream")
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, topics))
+    return outcomes
+
+
+def summarize_level(mode, concurrency, outcomes, wall_time, peak_rss):
+    from batch import percentile
+    from src.tracing import summarize_trace
+
+    latencies, overhead, outside = [], {}, []
+    errors = [o for o in outcomes if isinstance(o, BaseException)]
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            continue
+        elapsed, spans = outcome
+        latencies.append(elapsed)
+        for name, seconds in node_overhead(spans).items():
+            overhead.setdefault(name, []).append(seconds)
+        summary = summarize_trace(spans)
+        if summary:
+            # Time between and around nodes: graph scheduling, checkpoints, streaming
+            outside.append(max(0.0, elapsed - summary["wall_seconds"]))
+    for error in errors[:3]:
+        print(f"    error: {type(error).__name__}: {error}")
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "runs": len(outcomes),
+        "errors": len(errors),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "max": max(latencies, default=0.0),
+        "throughput_per_min": len(latencies) / wall_time * 60 if wall_time else 0.0,
+        "peak_rss_mb": peak_rss / 1024 / 1024,
+        "node_overhead_ms": {name: sum(v) / len(v) * 1000 for name, v in overhead.items()},
+        "outside_nodes_ms": sum(outside) / len(outside) * 1000 if outside else 0.0,
+    }
+
+
+def print_result(result):
+    print(
+        f"{result['mode']:<16} c={result['concurrency']:<4} runs={result['runs']:<4} err={result['errors']:<3} "
+        f"p50 {result['p50']:6.2f}s  p95 {result['p95']:6.2f}s  max {result['max']:6.2f}s  "
+        f"{result['throughput_per_min']:7.1f}/min  RSS {result['peak_rss_mb']:6.0f} MB"
+    )
+    overhead = "  ".join(f"{name} {ms:.1f}" for name, ms in result["node_overhead_ms"].items())
+    print(f"    overhead ms: {overhead}  outside nodes {result['outside_nodes_ms']:.1f}")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["mode"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "   n/a"
+
+    print(f"\n--- Compared with {baseline_path} ---")
+    for result in results:
+        old = baseline.get((result["mode"], result["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{result['mode']:<16} c={result['concurrency']:<4} p50 {change(result['p50'], old['p50'])}  "
+            f"p95 {change(result['p95'], old['p95'])}  "
+            f"throughput {change(result['throughput_per_min'], old['throughput_per_min'])}  "
+            f"RSS {change(result['peak_rss_mb'], old['peak_rss_mb'])}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline with stand-in backends")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--runs", type=int, default=16, help="reports per concurrency level")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured reports per mode (starts the chart pool)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="seconds per search")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds added to every call")
+    parser.add_argument("--response-chars", type=int, default=3000)
+    parser.add_argument("--search-chars", type=int, default=4000)
+    parser.add_argument("--reject-rate", type=float, default=0.2, help="probability that the reviewer rejects")
+    parser.add_argument("--charts", type=int, default=2, help="charts per report (0 skips rendering)")
+    parser.add_argument("--research-mode", choices=("single", "multi"), default="single")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pipeline-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    scratch = isolate_state()
+    print(f"--- BENCH: scratch state in {scratch} ---")
+
+    from src.registry import registry
+
+    graph = build_graph(args)
+    registry.register(graph)
+    app = None
+    if "generate_report" in args.modes:
+        import app
+
+    results = []
+    for mode in args.modes:
+        if args.warmup:
+            run_level(mode, 1, args.warmup, graph, app, f"warmup-{mode}")
+        for concurrency in args.concurrency:
+            sampler = RSSSampler()
+            sampler.start()
+            started = time.perf_counter()
+            outcomes = run_level(mode, concurrency, args.runs, graph, app, f"{mode}-{concurrency}")
+            wall_time = time.perf_counter() - started
+            result = summarize_level(mode, concurrency, outcomes, wall_time, sampler.stop())
+            print_result(result)
+            results.append(result)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "config": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"--- BENCH: results saved to {output} ---")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import hmac
+import json
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.history import HistoryManager
+from src.job_queue import JobQueue, start_workers
+from src.jobs import JobManager, QueueFull
+from src.workspace import cleanup_stale_workspaces
+
+PROVIDERS = ("gemini", "openai")
+MAX_BODY_BYTES = 64 * 1024
+# Seconds between keep-alive comments on an idle event stream
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """JSON API for report jobs, their progress events and the reports they produce.
+
+    POST /jobs                       submit {"topic", "provider", "force_refresh"}
+    GET  /jobs                       recent jobs
+    GET  /jobs/<id>                  job status
+    GET  /jobs/<id>/events           progress as Server-Sent Events
+    GET  /reports/<id>               report metadata and artifact links
+    GET  /reports/<id>/report.md     report text
+    GET  /reports/<id>/report.pdf    PDF, built on first request
+    GET  /reports/<id>/files/<name>  chart or trace file
+    GET  /metrics                    queue, worker and rate-limit metrics
+    GET  /health
+    """
+
+    server_version = "MarketAgents/1.0"
+
+    @property
+    def jobs(self):
+        return self.server.jobs
+
+    @property
+    def history(self):
+        return self.server.history
+
+    def log_message(self, format, *args):
+        print(f"--- API: {self.address_string()} {format % args} ---")
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {"error": message})
+
+    def _send_file(self, path, content_type=None):
+        content_type = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while chunk := f.read(64 * 1024):
+                self.wfile.write(chunk)
+
+    def _authorized(self):
+        token = self.server.api_token
+        if not token:
+            return True
+        header = self.headers.get("Authorization", "")
+        return hmac.compare_digest(header.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def _route(self, routes):
+        path = urlparse(self.path).path.rstrip("/") or "/"
+        if path != "/health" and not self._authorized():
+            return self._send_error(HTTPStatus.UNAUTHORIZED, "Missing or invalid bearer token")
+        for pattern, handler in routes:
+            match = re.fullmatch(pattern, path)
+            if match:
+                return handler(*match.groups())
+        self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+
+    def do_GET(self):
+        self._route([
+            (r"/health", self.health),
+            (r"/metrics", self.metrics),
+            (r"/jobs", self.list_jobs),
+            (r"/jobs/([\w-]+)", self.get_job),
+            (r"/jobs/([\w-]+)/events", self.job_events),
+            (r"/reports/([^/]+)", self.get_report),
+            (r"/reports/([^/]+)/report\.md", self.report_markdown),
+            (r"/reports/([^/]+)/report\.pdf", self.report_pdf),
+            (r"/reports/([^/]+)/files/([^/]+)", self.report_file),
+        ])
+
+    def do_POST(self):
+        self._route([(r"/jobs", self.submit_job)])
+
+    def health(self):
+        self._send_json(HTTPStatus.OK, {"status": "ok"})
+
+    def metrics(self):
+        self._send_json(HTTPStatus.OK, self.jobs.metrics())
+
+    def list_jobs(self):
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            limit = max(1, min(int(query.get("limit", ["50"])[0]), 1000))
+        except ValueError:
+            return self._send_error(HTTPStatus.BAD_REQUEST, "'limit' must be a number")
+        self._send_json(HTTPStatus.OK, {"jobs": self.jobs.list(limit)})
+
+    def submit_job(self):
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        topic = str(payload.get("topic") or "").strip()
+        provider = str(payload.get("provider") or "gemini").lower()
+        if not topic:
+            return self._send_error(HTTPStatus.BAD_REQUEST, "'topic' is required")
+        if provider not in PROVIDERS:
+            return self._send_error(HTTPStatus.BAD_REQUEST, f"'provider' must be one of {', '.join(PROVIDERS)}")
+        try:
+            job = self.jobs.submit(topic, provider, bool(payload.get("force_refresh", False)))
+        except QueueFull as e:
+            return self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}, {"Retry-After": "30"})
+        job["links"] = {"self": f"/jobs/{job['id']}", "events": f"/jobs/{job['id']}/events"}
+        self._send_json(HTTPStatus.ACCEPTED, job, {"Location": f"/jobs/{job['id']}"})
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, "Unknown job")
+        if job["report_id"]:
+            job["links"] = {"report": f"/reports/{job['report_id']}"}
+        self._send_json(HTTPStatus.OK, job)
+
+    def job_events(self, job_id):
+        if self.jobs.get(job_id) is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, "Unknown job")
+        # Reconnecting clients pick up after the last event they saw
+        try:
+            cursor = int(self.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            cursor = 0
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
+        self.end_headers()
+        try:
+            while True:
+                result = self.jobs.wait_events(job_id, cursor, SSE_HEARTBEAT)
+                if result is None:
+                    return
+                events, finished = result
+                if not events:
+                    if finished:
+                        return
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                for event_id, event, data in events:
+                    self.wfile.write(f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8"))
+                    cursor = event_id
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            return
+
+    def _report(self, report_id):
+        meta = self.history.get_report(report_id)
+        if meta is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown report")
+        return meta
+
+    def get_report(self, report_id):
+        meta = self._report(report_id)
+        if meta is None:
+            return
+        base = f"/reports/{report_id}"
+        links = {"markdown": f"{base}/report.md", "pdf": f"{base}/report.pdf"}
+        links["charts"] = [f"{base}/files/{name}" for name in meta["charts"]]
+        if meta.get("trace"):
+            links["trace"] = f"{base}/files/{meta['trace']}"
+        self._send_json(HTTPStatus.OK, {
+            "id": meta["id"], "topic": meta["topic"], "date": meta["date"],
+            "charts": meta["charts"], "links": links,
+        })
+
+    def report_markdown(self, report_id):
+        if self._report(report_id) is not None:
+            self._send_file(os.path.join(self.history.history_dir, report_id, "report.md"), "text/markdown; charset=utf-8")
+
+    def report_pdf(self, report_id):
+        meta = self._report(report_id)
+        if meta is None:
+            return
+        loaded = self.history.load_report(report_id)
+        if loaded is None:
+            return self._send_error(HTTPStatus.NOT_FOUND, "Report files are missing")
+        content, chart_paths, pdf_path = loaded
+        if not pdf_path or not os.path.exists(pdf_path):
+            # Built on first download in the PDF worker processes, as in the UI
+            from src.pdf import build_pdf, get_pdf_executor
+            date = datetime.strptime(meta["date"], "%Y-%m-%d %H:%M:%S")
+            chart_paths = [os.path.abspath(path) for path in chart_paths]
+            try:
+                pdf_data = get_pdf_executor().submit(build_pdf, content, chart_paths, meta["topic"], date).result()
+            except Exception as e:
+                print(f"--- API: PDF export failed for {report_id}: {e} ---")
+                return self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "PDF export failed")
+            if not pdf_data:
+                return self._send_error(HTTPStatus.NOT_FOUND, "Report is empty")
+            pdf_path = self.history.save_pdf(report_id, pdf_data)
+        self._send_file(pdf_path, "application/pdf")
+
+    def report_file(self, report_id, name):
+        meta = self._report(report_id)
+        if meta is None:
+            return
+        # Only files the report's metadata lists can be served, never arbitrary paths
+        allowed = set(meta["charts"]) | {meta.get("trace"), meta.get("pdf")}
+        path = os.path.join(self.history.history_dir, report_id, name)
+        if name not in allowed or not os.path.exists(path):
+            return self._send_error(HTTPStatus.NOT_FOUND, "Unknown file")
+        self._send_file(path)
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, jobs, history, api_token=None):
+        super().__init__(address, APIHandler)
+        self.jobs = jobs
+        self.history = history
+        self.api_token = api_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API for generating market research reports")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", 8000)))
+    parser.add_argument("--workers", type=int, help="reports generated at once (default JOB_WORKERS or 4)")
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("JOB_QUEUE_SIZE", 100)), help="jobs waiting before submissions are refused")
+    parser.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "history"))
+    parser.add_argument("--queue", default=os.getenv("JOB_QUEUE_PATH"),
+                        help="keep jobs in this shared SQLite queue, so worker.py processes can run them (--workers 0 leaves them all to those)")
+    args = parser.parse_args()
+    if args.workers is None:
+        args.workers = int(os.getenv("JOB_WORKERS", 4))
+    if args.workers < 0 or (args.workers == 0 and not args.queue):
+        # Without a shared queue nothing else would ever run the jobs
+        parser.error("--workers must be at least 1, or 0 together with --queue")
+
+    cleanup_stale_workspaces()
+    history = HistoryManager(args.history_dir)
+    stop = threading.Event()
+    if args.queue:
+        jobs = JobQueue(args.queue, max_queue=args.queue_size)
+        jobs.gc()
+        start_workers(jobs, history, args.workers, stop)
+    else:
+        jobs = JobManager(history, workers=args.workers, max_queue=args.queue_size)
+    server = APIServer((args.host, args.port), jobs, history, api_token=os.getenv("API_TOKEN"))
+    print(f"--- API: Listening on http://{args.host}:{args.port} with {args.workers} workers{f' on {args.queue}' if args.queue else ''} ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stop.set()
+        jobs.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
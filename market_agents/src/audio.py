@@ -0,0 +1,54 @@
+import hashlib
+import os
+import threading
+
+from .document import parse_report
+
+# Roughly two seconds of 128 kbps MP3, enough for the player to start on the first chunk
+AUDIO_CHUNK_SIZE = 32 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def tts_settings():
+    return os.getenv("TTS_MODEL", "tts-1"), os.getenv("TTS_VOICE", "alloy")
+
+
+def extract_summary(report_text):
+    """Return the text read out in the audio brief: the executive summary, or the report's opening."""
+    # Chart embeds are not read out, and finalize may rewrite them after the writer is done
+    return parse_report(report_text).summary()
+
+
+def audio_key(summary, model=None, voice=None):
+    """Cache key of a brief: the same summary read by the same voice is the same audio."""
+    default_model, default_voice = tts_settings()
+    payload = f"{model or default_model}\n{voice or default_voice}\n{summary}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _client
+
+
+def stream_speech(summary, model=None, voice=None, chunk_size=AUDIO_CHUNK_SIZE):
+    """Yield the MP3 of the brief in chunks as the TTS response arrives."""
+    default_model, default_voice = tts_settings()
+    with _get_client().audio.speech.with_streaming_response.create(
+        model=model or default_model,
+        voice=voice or default_voice,
+        input=f"Here is your market research executive summary. {summary}",
+        response_format="mp3",
+    ) as response:
+        for chunk in response.iter_bytes(chunk_size):
+            yield chunk
+
+
+def synthesize(summary, model=None, voice=None):
+    return b"".join(stream_speech(summary, model, voice))
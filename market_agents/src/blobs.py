@@ -0,0 +1,193 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """Content-addressed file store with reference counts kept in SQLite.
+
+    Each unique file is stored once under root/<2 hex chars>/<sha256> and placed
+    where it is needed as a hardlink (or a copy on filesystems without them), so
+    identical charts and PDFs across reports share one copy on disk. Callers take a
+    reference when they place a blob and release it when they drop it; compact()
+    deletes blobs nobody has referenced for a while.
+    """
+
+    def __init__(self, root, db_path):
+        self.root = root
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "hash TEXT PRIMARY KEY, size INTEGER NOT NULL, refs INTEGER NOT NULL, created_at REAL NOT NULL, "
+                "touched_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(blobs)")}
+            if "touched_at" not in columns:
+                # Stores from before the grace window count as untouched for a long time
+                conn.execute("ALTER TABLE blobs ADD COLUMN touched_at REAL NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _incref(self, digest, size):
+        conn = self._connect()
+        with conn:
+            now = time.time()
+            conn.execute(
+                "INSERT INTO blobs (hash, size, refs, created_at, touched_at) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET refs = refs + 1, touched_at = excluded.touched_at",
+                (digest, size, now, now),
+            )
+
+    def _write(self, digest, write):
+        blob = self.path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp)
+        os.replace(tmp, blob)
+
+    def _place(self, digest, dest, write):
+        # The reference is taken before the blob is touched, so a concurrent compact()
+        # cannot delete it between the existence check and the link.
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        for _ in range(2):
+            if not os.path.exists(self.path(digest)):
+                self._write(digest, write)
+            try:
+                os.link(self.path(digest), tmp)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                shutil.copyfile(self.path(digest), tmp)
+            os.replace(tmp, dest)
+            return
+        raise FileNotFoundError(f"blob {digest} disappeared while being placed")
+
+    def _add(self, digest, size, dest, write):
+        self._incref(digest, size)
+        try:
+            self._place(digest, dest, write)
+        except Exception:
+            # Nothing was placed, so the reference taken for it is dropped again
+            self.release(digest)
+            raise
+        return digest
+
+    def add_file(self, src, dest):
+        """Store src (unless its content is already stored), place it at dest and return its hash."""
+        return self._add(file_digest(src), os.path.getsize(src), dest, lambda tmp: shutil.copyfile(src, tmp))
+
+    def add_bytes(self, data, dest):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+
+        return self._add(hashlib.sha256(data).hexdigest(), len(data), dest, write)
+
+    def release(self, digest):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE blobs SET refs = MAX(refs - 1, 0), touched_at = ? WHERE hash = ?", (time.time(), digest)
+            )
+
+    def adopt(self, path):
+        """Bring an existing file under the store without copying it, and return its hash.
+
+        The file becomes a hardlink to the stored blob; if identical content is
+        already stored, the file is replaced by a link to that blob instead. No
+        reference is taken, recount() is expected to follow.
+        """
+        digest = file_digest(path)
+        blob = self.path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+        elif not os.path.samefile(path, blob):
+            self._place(digest, path, lambda tmp: shutil.copyfile(path, tmp))
+        return digest
+
+    def recount(self, counts):
+        """Replace every reference count with counts ({hash: refs}), the owner's view of who uses what."""
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE blobs SET refs = 0")
+            for digest, refs in counts.items():
+                if not os.path.exists(self.path(digest)):
+                    continue
+                conn.execute(
+                    "INSERT INTO blobs (hash, size, refs, created_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET refs = excluded.refs",
+                    (digest, os.path.getsize(self.path(digest)), refs, time.time()),
+                )
+
+    def compact(self, grace=3600):
+        """Delete blobs unreferenced and untouched for grace seconds, and stray files as old; return (files removed, bytes freed).
+
+        The grace window keeps a blob whose reference is being taken or swapped
+        right now, e.g. by a save racing a recount(), from being deleted under it.
+        """
+        cutoff = time.time() - grace
+        conn = self._connect()
+        with conn:
+            dead = conn.execute("SELECT hash, size FROM blobs WHERE refs <= 0 AND touched_at < ?", (cutoff,)).fetchall()
+            conn.execute("DELETE FROM blobs WHERE refs <= 0 AND touched_at < ?", (cutoff,))
+            live = {row[0] for row in conn.execute("SELECT hash FROM blobs")}
+
+        removed, freed = 0, 0
+        for digest, size in dead:
+            try:
+                os.remove(self.path(digest))
+                removed += 1
+                freed += size
+            except FileNotFoundError:
+                pass
+
+        # Files no row points at: leftovers of interrupted writes or of a lost index
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name not in live and os.path.getmtime(path) < cutoff:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        return removed, freed
+
+    def stats(self):
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs), 0) FROM blobs").fetchone()
+        return {"blobs": row[0], "bytes": row[1], "refs": row[2]}
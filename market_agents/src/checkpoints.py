@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CheckpointStore:
+    """SQLite store holding the latest AgentState of every run, keyed by run ID.
+
+    The graph saves a checkpoint after each node together with the nodes that
+    should run next, which is all that is needed to resume an interrupted run,
+    and deletes it once the run finishes. Old checkpoints are collected every
+    gc_interval seconds while saving, so long-running processes stay bounded.
+    """
+
+    def __init__(self, path, max_age=None, max_runs=None, gc_interval=None):
+        self.path = path
+        self.max_age = max_age
+        self.max_runs = max_runs
+        self.gc_interval = gc_interval
+        self._last_gc = time.monotonic()
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "run_id TEXT PRIMARY KEY, topic TEXT, state TEXT NOT NULL, "
+                "last_node TEXT, next_nodes TEXT NOT NULL, status TEXT NOT NULL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_updated ON checkpoints(updated_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, run_id, state, last_node, next_nodes):
+        now = time.time()
+        status = "running" if next_nodes else "done"
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO checkpoints (run_id, topic, state, last_node, next_nodes, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET state = excluded.state, last_node = excluded.last_node, "
+                "next_nodes = excluded.next_nodes, status = excluded.status, updated_at = excluded.updated_at",
+                (run_id, state.get("topic"), json.dumps(state), last_node, json.dumps(next_nodes), status, now, now),
+            )
+        if self.gc_interval is not None and time.monotonic() - self._last_gc > self.gc_interval:
+            self.gc()
+
+    def load(self, run_id):
+        row = self._connect().execute(
+            "SELECT state, last_node, next_nodes, status, updated_at FROM checkpoints WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state, last_node, next_nodes, status, updated_at = row
+        return {
+            "state": json.loads(state),
+            "last_node": last_node,
+            "next_nodes": json.loads(next_nodes),
+            "status": status,
+            "updated_at": updated_at,
+        }
+
+    def list_runs(self, status=None, limit=50):
+        query = "SELECT run_id, topic, last_node, status, updated_at FROM checkpoints"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [
+            {"run_id": r[0], "topic": r[1], "last_node": r[2], "status": r[3], "updated_at": r[4]}
+            for r in rows
+        ]
+
+    def delete(self, run_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+    def gc(self, max_age=None, max_runs=None):
+        """Drop checkpoints older than max_age seconds and keep at most max_runs, oldest finished runs first."""
+        max_age = max_age if max_age is not None else self.max_age
+        max_runs = max_runs if max_runs is not None else self.max_runs
+        self._last_gc = time.monotonic()
+        conn = self._connect()
+        removed = 0
+        with conn:
+            if max_age is not None:
+                removed += conn.execute(
+                    "DELETE FROM checkpoints WHERE updated_at < ?", (time.time() - max_age,)
+                ).rowcount
+            if max_runs is not None:
+                removed += conn.execute(
+                    "DELETE FROM checkpoints WHERE run_id IN ("
+                    "SELECT run_id FROM checkpoints ORDER BY status = 'running' DESC, updated_at DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (max_runs,),
+                ).rowcount
+        return removed
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """Return the process-wide checkpoint store, or None when CHECKPOINTS_ENABLED is off."""
+    global _checkpoint_store
+    if os.getenv("CHECKPOINTS_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore(
+                os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3")),
+                max_age=float(os.getenv("CHECKPOINT_MAX_AGE", 7 * 24 * 60 * 60)),
+                max_runs=int(os.getenv("CHECKPOINT_MAX_RUNS", 500)),
+                gc_interval=float(os.getenv("CHECKPOINT_GC_INTERVAL", 60 * 60)),
+            )
+            _checkpoint_store.gc()
+        return _checkpoint_store
@@ -0,0 +1,73 @@
+import os
+import re
+from functools import lru_cache
+
+_HEADING = re.compile(r"^##(?!#)[ \t]*(.*?)[ \t#]*$", re.MULTILINE)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\(([^)]*)\)")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+SUMMARY_TITLE = "Executive Summary"
+SUMMARY_FALLBACK_CHARS = 1000
+
+
+def strip_images(markdown):
+    return _BLANK_LINES.sub("\n\n", _IMAGE.sub("", markdown)).strip()
+
+
+class Section:
+    """One "## " section of a report, with its image references and plain text resolved."""
+
+    def __init__(self, title, markdown):
+        self.title = title
+        self.markdown = markdown.strip()
+        self.images = [(caption, target.split()[0] if target.split() else "") for caption, target in _IMAGE.findall(markdown)]
+        self.text = strip_images(markdown)
+
+
+class ReportDocument:
+    """Section tree of a writer report: the text before the first "## " heading, then one Section per heading.
+
+    Documents come from parse_report() and are shared between callers, so treat
+    them as read-only.
+    """
+
+    def __init__(self, markdown):
+        self.markdown = markdown
+        headings = list(_HEADING.finditer(markdown))
+        self.intro = Section("", markdown[:headings[0].start()] if headings else markdown)
+        self.sections = []
+        for idx, heading in enumerate(headings):
+            end = headings[idx + 1].start() if idx + 1 < len(headings) else len(markdown)
+            self.sections.append(Section(heading.group(1).strip(), markdown[heading.end():end]))
+
+    def find(self, title):
+        """Return the first section whose title matches, exactly or as a substring, ignoring case."""
+        title = title.lower()
+        for section in self.sections:
+            if section.title.lower() == title:
+                return section
+        for section in self.sections:
+            if title in section.title.lower():
+                return section
+        return None
+
+    @property
+    def images(self):
+        return [image for section in [self.intro] + self.sections for image in section.images]
+
+    def image_captions(self):
+        """Map chart file names to the captions the report embeds them with."""
+        return {os.path.basename(target): caption for caption, target in self.images if target}
+
+    def summary(self):
+        """Text of the executive summary, or of the report's opening when there is none."""
+        section = self.find(SUMMARY_TITLE)
+        if section is not None:
+            return section.text
+        return strip_images(self.markdown[:SUMMARY_FALLBACK_CHARS])
+
+
+@lru_cache(maxsize=32)
+def parse_report(markdown):
+    """Parse a report once; repeated calls with the same text return the cached document."""
+    return ReportDocument(markdown or "")
@@ -1,59 +1,265 @@
+import asyncio
+import contextvars
+import functools
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, List
-from langgraph.graph import StateGraph, END
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
+from .tools.chart_pool import ChartRenderError, get_chart_pool
+from .tools.charts import CHART_SPEC_EXAMPLE, ChartSpecError, parse_chart_specs, planned_chart_names, reconcile_chart_embeds
+from .tools.cache import LLMCache, get_llm_cache, get_search_cache, normalize_query
+from .tools.cassette import get_cassette
+from .tools.rate_limit import RateLimiter, estimate_tokens, get_rate_limiter
+from .tools.research import expand_queries, merge_results
+from .checkpoints import get_checkpoint_store
+from .tracing import atrace_span, payload_size, record_llm_response, trace_path, trace_span
+from .workspace import Workspace
 
 load_dotenv()
 
+DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "gemini": "gemini-2.5-flash",
+}
+
+# Event name run_stream/arun_stream use for incremental LLM output
+TOKEN_EVENT = "token"
+
+# Nodes that run side by side once the reviewer approves
+PARALLEL_NODES = ("chart_generator", "writer")
+
+def _default_search_tool():
+    # LangChain and the provider SDKs take seconds to import, so they are loaded on first use
+    from langchain_community.tools import DuckDuckGoSearchRun
+    return DuckDuckGoSearchRun()
+
+
+def _prompt_messages(prompt):
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=prompt)]
+
+
 class AgentState(TypedDict):
     topic: str
     research_data: List[str]
     analysis: str
     chart_files: List[str]
+    chart_specs: List[dict]
     final_report: str
     feedback: str
     revision_count: int
+    force_refresh: bool
+    run_id: str
+    workspace: str
+    resume_from: List[str]
 
 class MarketResearchGraph:
-    def __init__(self, model_provider="gemini"):
+    def __init__(self, model_provider="gemini", model=None, llm=None, search_tool=None, search_cache=None, llm_cache=None, research_mode=None, chart_pool=None, checkpoints=None, llm_limiter=None, search_limiter=None, cassette=None):
         self.model_provider = model_provider
-        self.search_tool = DuckDuckGoSearchRun()
-        self.llm = self._get_llm()
+        self.model = model or DEFAULT_MODELS.get(model_provider, DEFAULT_MODELS["gemini"])
+        self.cassette = cassette if cassette is not None else get_cassette()
+        # Replayed runs are served from the cassette and never build the real backends
+        replaying = self.cassette is not None and self.cassette.replaying
+        self.search_tool = search_tool or (None if replaying else _default_search_tool())
+        self.search_cache = search_cache if search_cache is not None else get_search_cache()
+        self.llm_cache = llm_cache if llm_cache is not None else get_llm_cache()
+        # "single" issues one query per pass, "multi" fans out over expand_queries()
+        self.research_mode = research_mode or os.getenv("RESEARCH_MODE", "single")
+        # At least one, a zero-sized pool or semaphore would fail or hang mid-run
+        self.research_workers = max(1, int(os.getenv("RESEARCH_MAX_WORKERS", 6)))
+        self.chart_pool = chart_pool
+        self.checkpoints = checkpoints if checkpoints is not None else get_checkpoint_store()
+        # "spec" asks the LLM for JSON chart specs, "code" for a matplotlib script
+        self.chart_mode = os.getenv("CHART_MODE", "spec")
+        # Nodes whose LLM output is forwarded token by token when streaming tokens
+        self.stream_nodes = tuple(n.strip() for n in os.getenv("STREAM_NODES", "writer").split(",") if n.strip())
+        self.llm = llm or (None if replaying else self._get_llm())
+        if self.cassette is not None:
+            # Every call has to reach the cassette, so the caches are bypassed
+            self.search_tool = self.cassette.search(self.search_tool)
+            self.llm = self.cassette.llm(self.llm)
+            self.search_cache = None
+            self.llm_cache = None
+        # Limiters are shared by every graph of the same provider in the process
+        self.llm_limiter = llm_limiter or (RateLimiter("replay") if replaying else get_rate_limiter(self.model_provider))
+        self.search_limiter = search_limiter or (RateLimiter("replay") if replaying else get_rate_limiter("search"))
+        self._app = None
+        self._app_lock = threading.Lock()
 
     def _get_llm(self):
         if self.model_provider == "openai":
+            from langchain_openai import ChatOpenAI
+            # The rate limiter retries throttled calls, SDK retries would multiply them
             return ChatOpenAI(
-                model="gpt-4o",
-                api_key=os.getenv("OPENAI_API_KEY")
+                model=self.model,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0
             )
         else:
             # Default to Gemini
+            from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
+                model=self.model,
                 google_api_key=os.getenv("GEMINI_API_KEY"),
-                temperature=0.7
+                temperature=0.7,
+                max_retries=0
             )
 
-    def researcher_node(self, state: AgentState):
+    def _cached_search(self, key, force_refresh):
+        if self.search_cache is None or force_refresh:
+            return None
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            print(f"--- Researcher: Using cached results for '{key}' ---")
+        return cached
+
+    def _store_search(self, key, results):
+        if self.search_cache is not None and results:
+            self.search_cache.set(key, results)
+
+    def _search(self, query: str, force_refresh=False):
+        key = normalize_query(query)
+        with trace_span("search", "search", query=query) as span:
+            cached = self._cached_search(key, force_refresh)
+            if cached is not None:
+                span.update(cached=True, response_chars=payload_size(cached))
+                return cached
+
+            results = self.search_limiter.call(self.search_tool.invoke, query)
+            span["response_chars"] = payload_size(results)
+        self._store_search(key, results)
+        return results
+
+    async def _asearch(self, query: str, force_refresh=False):
+        key = normalize_query(query)
+        # Cache and trace writes hit SQLite and disk, keep them off the event loop
+        async with atrace_span("search", "search", query=query) as span:
+            cached = await asyncio.to_thread(self._cached_search, key, force_refresh)
+            if cached is not None:
+                span.update(cached=True, response_chars=payload_size(cached))
+                return cached
+
+            results = await self.search_limiter.acall(self.search_tool.ainvoke, query)
+            span["response_chars"] = payload_size(results)
+        await asyncio.to_thread(self._store_search, key, results)
+        return results
+
+    def _search_many(self, queries, force_refresh=False):
+        print(f"--- Researcher: Running {len(queries)} searches in parallel ---")
+        errors = []
+
+        def search(query):
+            try:
+                return self._search(query, force_refresh)
+            except Exception as e:
+                print(f"Search failed for '{query}': {e}")
+                errors.append(e)
+                return ""
+
+        # Each search runs in a copy of this context so its span lands under the researcher's
+        with ThreadPoolExecutor(max_workers=min(self.research_workers, len(queries))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, search, query) for query in queries]
+            results = [future.result() for future in futures]
+
+        if errors and len(errors) == len(queries):
+            raise errors[0]
+        return merge_results(results)
+
+    async def _asearch_many(self, queries, force_refresh=False):
+        print(f"--- Researcher: Running {len(queries)} searches concurrently ---")
+        errors = []
+        semaphore = asyncio.Semaphore(self.research_workers)
+
+        async def search(query):
+            async with semaphore:
+                try:
+                    return await self._asearch(query, force_refresh)
+                except Exception as e:
+                    print(f"Search failed for '{query}': {e}")
+                    errors.append(e)
+                    return ""
+
+        results = await asyncio.gather(*(search(query) for query in queries))
+
+        if errors and len(errors) == len(queries):
+            raise errors[0]
+        return merge_results(results)
+
+    def _llm_cache_key(self, prompt):
+        if self.llm_cache is None:
+            return None
+        temperature = getattr(self.llm, "temperature", None)
+        return LLMCache.make_key(self.model_provider, self.model, temperature, prompt)
+
+    def _cached_response(self, node, key, force_refresh):
+        if key is None or force_refresh:
+            return None
+        cached = self.llm_cache.get(node, key)
+        if cached is not None:
+            print(f"--- {node}: Using cached LLM response ---")
+        return cached
+
+    def _invoke_llm(self, node: str, prompt: str, force_refresh=False):
+        key = self._llm_cache_key(prompt)
+        with trace_span("llm", node, model=self.model, prompt_chars=len(prompt)) as span:
+            cached = self._cached_response(node, key, force_refresh)
+            if cached is not None:
+                span.update(cached=True, response_chars=len(cached))
+                return cached
+
+            response = self.llm_limiter.call(self.llm.invoke, _prompt_messages(prompt), tokens=estimate_tokens(prompt))
+            record_llm_response(span, response, self.model)
+        if key is not None and response.content:
+            self.llm_cache.set(key, response.content)
+        return response.content
+
+    async def _ainvoke_llm(self, node: str, prompt: str, force_refresh=False):
+        key = self._llm_cache_key(prompt)
+        async with atrace_span("llm", node, model=self.model, prompt_chars=len(prompt)) as span:
+            cached = await asyncio.to_thread(self._cached_response, node, key, force_refresh)
+            if cached is not None:
+                span.update(cached=True, response_chars=len(cached))
+                return cached
+
+            response = await self.llm_limiter.acall(self.llm.ainvoke, _prompt_messages(prompt), tokens=estimate_tokens(prompt))
+            record_llm_response(span, response, self.model)
+        if key is not None and response.content:
+            await asyncio.to_thread(self.llm_cache.set, key, response.content)
+        return response.content
+
+    def _research_queries(self, state: AgentState):
         print(f"--- Researcher: Searching for {state['topic']} ---")
         topic = state['topic']
         feedback = state.get('feedback', '')
-        
-        query = f"latest market trends and news for {topic} last 12 months"
         if feedback:
-            query = f"market research for {topic} focusing on: {feedback}"
             print(f"--- Researcher: Refining search based on feedback: {feedback} ---")
-            
-        search_results = self.search_tool.invoke(query)
+
+        if self.research_mode == "multi":
+            return expand_queries(topic, feedback)
+
+        if feedback:
+            return [f"market research for {topic} focusing on: {feedback}"]
+        return [f"latest market trends and news for {topic} last 12 months"]
+
+    def researcher_node(self, state: AgentState):
+        queries = self._research_queries(state)
+        if len(queries) > 1:
+            return {"research_data": self._search_many(queries, state.get('force_refresh', False))}
+
+        search_results = self._search(queries[0], state.get('force_refresh', False))
         return {"research_data": [search_results]}
 
-    def analyst_node(self, state: AgentState):
+    async def aresearcher_node(self, state: AgentState):
+        queries = self._research_queries(state)
+        if len(queries) > 1:
+            return {"research_data": await self._asearch_many(queries, state.get('force_refresh', False))}
+
+        search_results = await self._asearch(queries[0], state.get('force_refresh', False))
+        return {"research_data": [search_results]}
+
+    def _analyst_prompt(self, state: AgentState):
         print("--- Analyst: Analyzing data ---")
         data = "\n".join(state['research_data'])
         feedback = state.get('feedback', '')
@@ -68,20 +274,27 @@ class MarketResearchGraph:
         
         if feedback:
             prompt += f"\n\nIMPORTANT: Previous analysis was rejected. Please address this feedback: {feedback}"
-            
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        return {"analysis": response.content}
+        return prompt
 
-    def reviewer_node(self, state: AgentState):
+    def analyst_node(self, state: AgentState):
+        prompt = self._analyst_prompt(state)
+        analysis = self._invoke_llm("analyst", prompt, state.get('force_refresh', False))
+        return {"analysis": analysis}
+
+    async def aanalyst_node(self, state: AgentState):
+        prompt = self._analyst_prompt(state)
+        analysis = await self._ainvoke_llm("analyst", prompt, state.get('force_refresh', False))
+        return {"analysis": analysis}
+
+    def _reviewer_prompt(self, state: AgentState):
         print("--- Reviewer: Reviewing analysis ---")
         analysis = state['analysis']
-        revision_count = state.get('revision_count', 0)
         
-        if revision_count >= 2:
+        if state.get('revision_count', 0) >= 2:
             print("--- Reviewer: Max revisions reached, approving ---")
-            return {"feedback": None}
+            return None
             
-        prompt = f"""
+        return f"""
         Review the following market analysis for {state['topic']}:
         {analysis}
         
@@ -89,28 +302,58 @@ class MarketResearchGraph:
         If YES, respond with "APPROVED".
         If NO, respond with "REJECTED" followed by specific feedback on what is missing or needs improvement (e.g., "Missing specific market size data", "Too generic", "Needs more focus on risks").
         """
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        result = response.content
-        
+
+    def _review_outcome(self, state: AgentState, result):
         if "APPROVED" in result:
             return {"feedback": None}
         else:
             feedback = result.replace("REJECTED", "").strip()
-            return {"feedback": feedback, "revision_count": revision_count + 1}
+            return {"feedback": feedback, "revision_count": state.get('revision_count', 0) + 1}
 
-    def chart_generator_node(self, state: AgentState):
+    def reviewer_node(self, state: AgentState):
+        prompt = self._reviewer_prompt(state)
+        if prompt is None:
+            return {"feedback": None}
+        result = self._invoke_llm("reviewer", prompt, state.get('force_refresh', False))
+        return self._review_outcome(state, result)
+
+    async def areviewer_node(self, state: AgentState):
+        prompt = self._reviewer_prompt(state)
+        if prompt is None:
+            return {"feedback": None}
+        result = await self._ainvoke_llm("reviewer", prompt, state.get('force_refresh', False))
+        return self._review_outcome(state, result)
+
+    def _chart_prompt(self, state: AgentState):
         print("--- Chart Generator: Creating charts ---")
         analysis = state['analysis']
+        workspace = state['workspace']
         
         # Clean up previous charts
-        for f in os.listdir():
+        for f in os.listdir(workspace):
             if f.startswith("chart_") and f.endswith(".png"):
                 try:
-                    os.remove(f)
+                    os.remove(os.path.join(workspace, f))
                 except:
                     pass
 
-        prompt = f"""
+        if self.chart_mode != "code":
+            return f"""
+        Based on the following analysis, describe up to 3 relevant charts (bar, horizontal bar, stacked bar, line or pie) if the data allows.
+        
+        Analysis:
+        {analysis}
+        
+        Requirements:
+        1. Respond with a JSON object of the form: {CHART_SPEC_EXAMPLE}
+        2. "type" is one of "bar", "barh", "stacked_bar", "line", "pie".
+        3. Every series has exactly one numeric value per label; pie charts have exactly one series.
+        4. Use the figures in the analysis (estimate values if necessary but keep them realistic).
+        5. Put units in "unit" and keep numbers plain (no currency symbols or thousands separators).
+        6. Return ONLY the JSON, no markdown formatting like ```json.
+        """
+
+        return f"""
         Based on the following analysis, generate Python code using matplotlib to create MULTIPLE relevant charts (bar charts, pie charts, or line charts) if the data allows.
         
         Analysis:
@@ -121,40 +364,69 @@ class MarketResearchGraph:
         2. The code should be self-contained (import matplotlib.pyplot as plt, etc.).
         3. Define the data directly in the code based on the analysis (estimate values if necessary but keep them realistic).
         4. Create as many distinct charts as relevant (at least 1, up to 3).
-        5. Save the plots to files named 'chart_1.png', 'chart_2.png', etc. using plt.savefig().
+        5. Save the plots to files named 'chart_1.png', 'chart_2.png', etc. inside the directory OUTPUT_DIR using plt.savefig(os.path.join(OUTPUT_DIR, 'chart_1.png')). OUTPUT_DIR and os are already defined, do not redefine them.
         6. Clear the figure between plots using plt.clf() or plt.figure().
         7. Use a modern, professional style (e.g., plt.style.use('ggplot') or custom colors).
         8. Do NOT use plt.show().
         9. Return ONLY the python code, no markdown formatting like ```python.
         """
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        code = response.content.replace("```python", "").replace("```", "").strip()
-        
-        # Execute the code to generate the chart
-        try:
-            exec(code, {"plt": plt})
-            print("Charts generated successfully.")
-        except Exception as e:
-            print(f"Failed to generate charts: {e}")
+
+    def _render_charts(self, response, workspace):
+        # Rendering happens out of process in the chart pool
+        pool = self.chart_pool or get_chart_pool()
+        specs = []
+        with trace_span("chart", self.chart_mode, prompt_chars=len(response)) as span:
+            try:
+                if self.chart_mode == "code":
+                    code = response.replace("```python", "").replace("```", "").strip()
+                    charts = pool.render(code)
+                else:
+                    rendered = pool.render_specs(parse_chart_specs(response))
+                    charts = [(name, data) for name, data, _ in rendered]
+                    # Only the specs that rendered, in file order, so captions match their charts
+                    specs = [spec for _, _, spec in rendered]
+                print(f"Generated {len(charts)} chart(s).")
+            except (ChartRenderError, ChartSpecError) as e:
+                print(f"Failed to generate charts: {e}")
+                span["error"] = str(e)[:500]
+                charts, specs = [], []
+            span["charts"] = len(charts)
+            span["response_chars"] = sum(len(data) for _, data in charts)
             
-        # Find generated charts
-        chart_files = [f for f in os.listdir() if f.startswith("chart_") and f.endswith(".png")]
-        chart_files.sort() # Ensure consistent order
-        return {"chart_files": chart_files}
+        chart_files = []
+        for name, data in charts:
+            path = os.path.join(workspace, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            chart_files.append(path)
+        return {"chart_files": chart_files, "chart_specs": specs}
 
-    def writer_node(self, state: AgentState):
+    def chart_generator_node(self, state: AgentState):
+        prompt = self._chart_prompt(state)
+        response = self._invoke_llm("chart_generator", prompt, state.get('force_refresh', False))
+        return self._render_charts(response, state['workspace'])
+
+    async def achart_generator_node(self, state: AgentState):
+        prompt = self._chart_prompt(state)
+        response = await self._ainvoke_llm("chart_generator", prompt, state.get('force_refresh', False))
+        # Waiting on the chart pool blocks, keep it off the event loop
+        return await asyncio.to_thread(self._render_charts, response, state['workspace'])
+
+    def _writer_prompt(self, state: AgentState):
         print("--- Writer: Writing report ---")
         analysis = state['analysis']
-        chart_files = state.get('chart_files', [])
+        # Charts render in parallel with the writer, so it works from pre-assigned names
+        chart_files = planned_chart_names()
         
-        prompt = f"""
+        return f"""
         Write a comprehensive market research report on {state['topic']} based on the following analysis:
         {analysis}
         
         The report must be in Markdown format with sections for Executive Summary, Key Trends, Opportunities, Risks, and Conclusion.
         
-        IMPORTANT: The following chart images have been generated: {", ".join(chart_files)}
+        IMPORTANT: Up to {len(chart_files)} charts visualizing the numerical data in the analysis are being generated as: {", ".join(chart_files)}
         You MUST embed these charts inline within the relevant sections of your report using markdown image syntax: ![Description](filename)
+        Embed each chart at most once. Charts that end up not being generated are removed automatically.
         
         For example:
         - Place market trend charts in the "Key Trends" section
@@ -164,24 +436,81 @@ class MarketResearchGraph:
         DO NOT create a separate "Visualizations" section at the end. Instead, embed each chart directly in the section where it's most relevant.
         Each chart should have a descriptive caption that explains what it shows.
         """
-        response = self.llm.invoke([HumanMessage(content=prompt)])
+
+    def writer_node(self, state: AgentState):
+        prompt = self._writer_prompt(state)
+        report = self._invoke_llm("writer", prompt, state.get('force_refresh', False))
+        
+        return {"final_report": report}
+
+    async def awriter_node(self, state: AgentState):
+        prompt = self._writer_prompt(state)
+        report = await self._ainvoke_llm("writer", prompt, state.get('force_refresh', False))
         
-        return {"final_report": response.content}
+        return {"final_report": report}
+
+    def finalize_node(self, state: AgentState):
+        print("--- Finalize: Reconciling chart embeds ---")
+        report = reconcile_chart_embeds(state['final_report'], state.get('chart_files', []), state.get('chart_specs', []))
+        return {"final_report": report}
 
     def should_continue(self, state: AgentState):
         if state.get('feedback'):
             return "researcher"
-        return "chart_generator"
+        # Fan out: charts and the report are produced concurrently
+        return list(PARALLEL_NODES)
+
+    def route_entry(self, state: AgentState):
+        # Resumed runs start at the nodes recorded in their checkpoint
+        return state.get('resume_from') or "researcher"
+
+    def _node_span(self, name, state, span=trace_span):
+        return span("node", name, path=trace_path(state["workspace"]), revision_count=state.get("revision_count", 0))
+
+    def _record_update(self, span, update):
+        span["output_chars"] = payload_size(update)
+        if update and "revision_count" in update:
+            span["revision_count"] = update["revision_count"]
+
+    def _traced(self, name, func):
+        """Wrap a node so each run of it is recorded as a span in the run's trace."""
+        @functools.wraps(func)
+        def node(state):
+            with self._node_span(name, state) as span:
+                update = func(state)
+                self._record_update(span, update)
+            return update
+        return node
+
+    def _atraced(self, name, func):
+        @functools.wraps(func)
+        async def node(state):
+            async with self._node_span(name, state, atrace_span) as span:
+                update = await func(state)
+                self._record_update(span, update)
+            return update
+        return node
+
+    def _node(self, name, func, afunc):
+        from langchain_core.runnables import RunnableLambda
+        return RunnableLambda(self._traced(name, func), afunc=self._atraced(name, afunc))
 
     def _create_graph(self):
+        # Every node carries a sync and an async implementation, so the same compiled
+        # graph serves invoke/stream and ainvoke/astream without blocking the event loop.
+        from langgraph.graph import StateGraph, END
         workflow = StateGraph(AgentState)
-        workflow.add_node("researcher", self.researcher_node)
-        workflow.add_node("analyst", self.analyst_node)
-        workflow.add_node("reviewer", self.reviewer_node)
-        workflow.add_node("chart_generator", self.chart_generator_node)
-        workflow.add_node("writer", self.writer_node)
+        workflow.add_node("researcher", self._node("researcher", self.researcher_node, self.aresearcher_node))
+        workflow.add_node("analyst", self._node("analyst", self.analyst_node, self.aanalyst_node))
+        workflow.add_node("reviewer", self._node("reviewer", self.reviewer_node, self.areviewer_node))
+        workflow.add_node("chart_generator", self._node("chart_generator", self.chart_generator_node, self.achart_generator_node))
+        workflow.add_node("writer", self._node("writer", self.writer_node, self.awriter_node))
+        workflow.add_node("finalize", self._traced("finalize", self.finalize_node))
         
-        workflow.set_entry_point("researcher")
+        workflow.set_conditional_entry_point(
+            self.route_entry,
+            {node: node for node in ["researcher", "analyst", "reviewer", "chart_generator", "writer", "finalize"]}
+        )
         workflow.add_edge("researcher", "analyst")
         workflow.add_edge("analyst", "reviewer")
         
@@ -190,25 +519,150 @@ class MarketResearchGraph:
             self.should_continue,
             {
                 "researcher": "researcher",
-                "chart_generator": "chart_generator"
+                "chart_generator": "chart_generator",
+                "writer": "writer"
             }
         )
         
-        workflow.add_edge("chart_generator", "writer")
-        workflow.add_edge("writer", END)
+        # Both branches finish in the same step, so finalize runs once after them
+        workflow.add_edge("chart_generator", "finalize")
+        workflow.add_edge("writer", "finalize")
+        workflow.add_edge("finalize", END)
         return workflow.compile()
 
-    def run(self, topic: str):
-        app = self._create_graph()
-        inputs = {"topic": topic, "research_data": [], "analysis": "", "chart_files": [], "final_report": "", "feedback": None, "revision_count": 0}
-        result = app.invoke(inputs)
-        with open("report.md", "w") as f:
-            f.write(result["final_report"])
-        return result
-
-    def run_stream(self, topic: str):
-        app = self._create_graph()
-        inputs = {"topic": topic, "research_data": [], "analysis": "", "chart_files": [], "final_report": "", "feedback": None, "revision_count": 0}
-        for output in app.stream(inputs):
+    def get_app(self):
+        """Return the compiled graph, compiling it on first use only."""
+        if self._app is None:
+            with self._app_lock:
+                if self._app is None:
+                    self._app = self._create_graph()
+        return self._app
+
+    def _initial_state(self, topic: str, force_refresh=False, workspace=None):
+        workspace = workspace or Workspace()
+        return {"topic": topic, "research_data": [], "analysis": "", "chart_files": [], "chart_specs": [], "final_report": "", "feedback": None, "revision_count": 0, "force_refresh": force_refresh,
+                "run_id": workspace.run_id, "workspace": workspace.path}
+
+    def _start(self, topic, force_refresh=False, workspace=None, run_id=None):
+        """Return (inputs, state) for a new run, or for resuming run_id from its checkpoint."""
+        run_id = run_id or (workspace.run_id if workspace else None)
+        checkpoint = self.checkpoints.load(run_id) if self.checkpoints is not None and run_id else None
+        if checkpoint is None:
+            state = self._initial_state(topic, force_refresh, workspace or Workspace(run_id=run_id))
+            return dict(state), state
+
+        state = checkpoint["state"]
+        os.makedirs(state["workspace"], exist_ok=True)
+        print(f"--- Resuming run {run_id} at {', '.join(checkpoint['next_nodes'])} ---")
+        return dict(state, resume_from=checkpoint["next_nodes"]), state
+
+    def _next_nodes(self, node, update, pending):
+        """Mirror the graph edges to work out which nodes follow a finished node."""
+        if node == "researcher":
+            return ["analyst"]
+        if node == "analyst":
+            return ["reviewer"]
+        if node == "reviewer":
+            if update.get("feedback"):
+                return ["researcher"]
+            pending.update(PARALLEL_NODES)
+            return list(PARALLEL_NODES)
+        if node in PARALLEL_NODES:
+            pending.discard(node)
+            return sorted(pending) or ["finalize"]
+        return []
+
+    def _checkpoint(self, state, node, next_nodes):
+        if next_nodes:
+            self.checkpoints.save(state["run_id"], state, node, next_nodes)
+        else:
+            # A finished run has nothing left to resume
+            self.checkpoints.delete(state["run_id"])
+
+    def _track(self, events, state, inputs):
+        """Fold node updates into state and checkpoint it after every node."""
+        pending = set(inputs.get("resume_from") or []) & set(PARALLEL_NODES)
+        for key, value in events:
+            if key != TOKEN_EVENT:
+                state.update(value or {})
+                if self.checkpoints is not None:
+                    self._checkpoint(state, key, self._next_nodes(key, value or {}, pending))
+            yield key, value
+
+    async def _atrack(self, events, state, inputs):
+        pending = set(inputs.get("resume_from") or []) & set(PARALLEL_NODES)
+        async for key, value in events:
+            if key != TOKEN_EVENT:
+                state.update(value or {})
+                if self.checkpoints is not None:
+                    # A SQLite write, kept off the event loop so other sessions keep running
+                    await asyncio.to_thread(self._checkpoint, state, key, self._next_nodes(key, value or {}, pending))
+            yield key, value
+
+    def _token_event(self, chunk):
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        content = getattr(message, "content", "")
+        if node in self.stream_nodes and isinstance(content, str) and content:
+            # A retried call streams again under a new message ID, so consumers can start over
+            return TOKEN_EVENT, {"node": node, "content": content, "message_id": getattr(message, "id", None)}
+        return None
+
+    def _events(self, outputs, stream_tokens):
+        for output in outputs:
+            if stream_tokens:
+                mode, output = output
+                if mode == "messages":
+                    event = self._token_event(output)
+                    if event:
+                        yield event
+                    continue
+            for key, value in output.items():
+                yield key, value
+
+    async def _aevents(self, outputs, stream_tokens):
+        async for output in outputs:
+            if stream_tokens:
+                mode, output = output
+                if mode == "messages":
+                    event = self._token_event(output)
+                    if event:
+                        yield event
+                    continue
             for key, value in output.items():
                 yield key, value
+
+    def _stream_options(self, stream_tokens):
+        return {"stream_mode": ["updates", "messages"]} if stream_tokens else {}
+
+    def _save_report(self, state):
+        with open(os.path.join(state["workspace"], "report.md"), "w") as f:
+            f.write(state["final_report"])
+
+    def run(self, topic: str = None, force_refresh=False, workspace=None, run_id=None):
+        """Run the graph to completion, resuming run_id from its checkpoint when one exists."""
+        inputs, state = self._start(topic, force_refresh, workspace, run_id)
+        for _ in self._track(self._events(self.get_app().stream(inputs), False), state, inputs):
+            pass
+        self._save_report(state)
+        return state
+
+    def run_stream(self, topic: str = None, force_refresh=False, workspace=None, stream_tokens=False, run_id=None):
+        """Yield (node, update) after every node; with stream_tokens also (TOKEN_EVENT, chunk)."""
+        inputs, state = self._start(topic, force_refresh, workspace, run_id)
+        outputs = self.get_app().stream(inputs, **self._stream_options(stream_tokens))
+        yield from self._track(self._events(outputs, stream_tokens), state, inputs)
+
+    async def arun(self, topic: str = None, force_refresh=False, workspace=None, run_id=None):
+        inputs, state = await asyncio.to_thread(self._start, topic, force_refresh, workspace, run_id)
+        async for _ in self._atrack(self._aevents(self.get_app().astream(inputs), False), state, inputs):
+            pass
+        await asyncio.to_thread(self._save_report, state)
+        return state
+
+    async def arun_stream(self, topic: str = None, force_refresh=False, workspace=None, stream_tokens=False, run_id=None):
+        """Async counterpart of run_stream."""
+        inputs, state = await asyncio.to_thread(self._start, topic, force_refresh, workspace, run_id)
+        outputs = self.get_app().astream(inputs, **self._stream_options(stream_tokens))
+        async for event in self._atrack(self._aevents(outputs, stream_tokens), state, inputs):
+            yield event
@@ -0,0 +1,395 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import re
+import threading
+from datetime import datetime, timedelta
+
+from .blobs import BlobStore
+
+# Weight of a topic match relative to a match in the report body when ranking search results
+TOPIC_WEIGHT = 10.0
+
+# Words present in nearly every report add nothing to the ranking but dominate its cost
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+
+
+class HistoryManager:
+    """Archive of finished reports with a SQLite index over their metadata.
+
+    Each report lives in its own directory with report.md, charts, the PDF and a
+    metadata.json. The index mirrors metadata.json so listing and lookups never
+    have to walk the directory tree, and an FTS5 table over topics and report
+    text backs search(); rebuild_index() recreates both from disk. Charts and PDFs
+    are hardlinks into a shared BlobStore, recorded in metadata["blobs"], so
+    identical files are stored once however many reports contain them.
+    """
+
+    def __init__(self, history_dir="history"):
+        self.history_dir = history_dir
+        os.makedirs(history_dir, exist_ok=True)
+        self.index_path = os.path.join(history_dir, "index.sqlite3")
+        self._local = threading.local()
+        # Serializes read-modify-write updates of one report's metadata and blob references
+        self._report_locks = {}
+        self._report_locks_guard = threading.Lock()
+        self.blobs = BlobStore(os.path.join(history_dir, "blobs"), self.index_path)
+
+        is_new = not os.path.exists(self.index_path)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "id TEXT PRIMARY KEY, topic TEXT NOT NULL, date TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS reports_topic ON reports(topic)")
+            conn.execute("CREATE INDEX IF NOT EXISTS reports_topic_nocase ON reports(topic COLLATE NOCASE, date)")
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'"
+            ).fetchone() is not None
+            self.fts = True
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts "
+                    "USING fts5(topic, content, tokenize = 'porter unicode61', prefix = '2 3')"
+                )
+            except sqlite3.OperationalError:
+                print("--- HISTORY: SQLite was built without FTS5, search falls back to topic matching ---")
+                self.fts = False
+        # Indexes created before full-text search existed need their report text loaded once
+        if is_new or (self.fts and not has_fts):
+            self.rebuild_index()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _report_lock(self, report_id):
+        with self._report_locks_guard:
+            return self._report_locks.setdefault(report_id, threading.Lock())
+
+    def _index(self, conn, metadata, content):
+        # Upsert rather than replace so the rowid, which keys the FTS row, stays stable
+        conn.execute(
+            "INSERT INTO reports (id, topic, date, metadata) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET topic = excluded.topic, date = excluded.date, metadata = excluded.metadata",
+            (metadata["id"], metadata["topic"], metadata["date"], json.dumps(metadata)),
+        )
+        if self.fts:
+            rowid = conn.execute("SELECT rowid FROM reports WHERE id = ?", (metadata["id"],)).fetchone()[0]
+            conn.execute("DELETE FROM reports_fts WHERE rowid = ?", (rowid,))
+            conn.execute(
+                "INSERT INTO reports_fts (rowid, topic, content) VALUES (?, ?, ?)",
+                (rowid, metadata["topic"], content),
+            )
+
+    def save_report(self, topic, report_content, chart_paths, pdf_data=None, trace_path=None):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_topic = "".join([c for c in topic if c.isalnum() or c in (' ', '-', '_')]).strip().replace(' ', '_')
+        report_id = f"{timestamp}_{safe_topic}"
+        report_dir = os.path.join(self.history_dir, report_id)
+
+        # Concurrent runs, possibly in other worker processes, can finish the same topic
+        # within the same second; creating the directory is what claims the ID
+        suffix = 1
+        while True:
+            try:
+                os.makedirs(report_dir)
+                break
+            except FileExistsError:
+                suffix += 1
+                report_id = f"{timestamp}_{safe_topic}_{suffix}"
+                report_dir = os.path.join(self.history_dir, report_id)
+
+        # Save metadata
+        metadata = {
+            "id": report_id,
+            "topic": topic,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "charts": [],
+            "pdf": "report.pdf" if pdf_data else None
+        }
+
+        # Save report content
+        with open(os.path.join(report_dir, "report.md"), "w", encoding="utf-8") as f:
+            f.write(report_content)
+
+        # Link charts and the PDF from the blob store instead of copying them
+        metadata["blobs"] = {}
+        for chart_path in chart_paths:
+            if os.path.exists(chart_path):
+                chart_name = os.path.basename(chart_path)
+                metadata["blobs"][chart_name] = self.blobs.add_file(chart_path, os.path.join(report_dir, chart_name))
+                metadata["charts"].append(chart_name)
+
+        # The PDF is usually built later, on first download (see save_pdf)
+        if pdf_data:
+            metadata["blobs"]["report.pdf"] = self.blobs.add_bytes(pdf_data, os.path.join(report_dir, "report.pdf"))
+
+        # The run's trace is small and unique to the run, it is copied as is
+        if trace_path and os.path.exists(trace_path):
+            shutil.copyfile(trace_path, os.path.join(report_dir, "trace.jsonl"))
+            metadata["trace"] = "trace.jsonl"
+
+        # Save metadata json
+        with open(os.path.join(report_dir, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=4)
+
+        conn = self._connect()
+        with conn:
+            self._index(conn, metadata, report_content)
+
+        return report_id
+
+    def save_pdf(self, report_id, pdf_data):
+        """Store a PDF built after the report was saved and return its path."""
+        with self._report_lock(report_id):
+            meta = self.get_report(report_id)
+            report_dir = os.path.join(self.history_dir, report_id)
+            if meta is None or not os.path.exists(report_dir):
+                return None
+
+            # The blob is linked in under a temporary name and renamed, so a concurrent reader never sees a partial file
+            pdf_path = os.path.join(report_dir, "report.pdf")
+            blobs = meta.setdefault("blobs", {})
+            previous = blobs.get("report.pdf")
+            blobs["report.pdf"] = self.blobs.add_bytes(pdf_data, pdf_path)
+            if previous:
+                self.blobs.release(previous)
+
+            meta["pdf"] = "report.pdf"
+            conn = self._connect()
+            with conn:
+                self._write_metadata(conn, meta)
+            return pdf_path
+
+    def get_audio(self, report_id, key):
+        """Return the stored audio brief of a report for an audio key, if one was generated."""
+        meta = self.get_report(report_id)
+        name = ((meta or {}).get("audio") or {}).get(key)
+        path = os.path.join(self.history_dir, report_id, name) if name else None
+        return path if path and os.path.exists(path) else None
+
+    def save_audio(self, report_id, key, audio_data):
+        """Store an audio brief next to the report and return its path."""
+        with self._report_lock(report_id):
+            meta = self.get_report(report_id)
+            report_dir = os.path.join(self.history_dir, report_id)
+            if meta is None or not os.path.exists(report_dir):
+                return None
+
+            name = f"summary_{key[:16]}.mp3"
+            path = os.path.join(report_dir, name)
+            blobs = meta.setdefault("blobs", {})
+            previous = blobs.get(name)
+            blobs[name] = self.blobs.add_bytes(audio_data, path)
+            if previous:
+                self.blobs.release(previous)
+            meta.setdefault("audio", {})[key] = name
+
+            conn = self._connect()
+            with conn:
+                self._write_metadata(conn, meta)
+            return path
+
+    def _write_metadata(self, conn, meta):
+        with open(os.path.join(self.history_dir, meta["id"], "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+        conn.execute("UPDATE reports SET metadata = ? WHERE id = ?", (json.dumps(meta), meta["id"]))
+
+    def delete_report(self, report_id):
+        """Remove a report and release its blobs; their disk space is reclaimed by compact()."""
+        with self._report_lock(report_id):
+            meta = self.get_report(report_id)
+            if meta is None:
+                return False
+            for digest in (meta.get("blobs") or {}).values():
+                self.blobs.release(digest)
+            conn = self._connect()
+            with conn:
+                if self.fts:
+                    conn.execute(
+                        "DELETE FROM reports_fts WHERE rowid = (SELECT rowid FROM reports WHERE id = ?)", (report_id,)
+                    )
+                conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+            shutil.rmtree(os.path.join(self.history_dir, report_id), ignore_errors=True)
+        with self._report_locks_guard:
+            self._report_locks.pop(report_id, None)
+        return True
+
+    def compact(self):
+        """Deduplicate report files into the blob store, recount references and delete unused blobs."""
+        counts = {}
+        adopted = 0
+        conn = self._connect()
+        for meta in self.get_history():
+            report_dir = os.path.join(self.history_dir, meta["id"])
+            blobs = meta.setdefault("blobs", {})
+            names = list(meta["charts"]) + (["report.pdf"] if meta.get("pdf") else [])
+            names += list((meta.get("audio") or {}).values())
+            changed = False
+            for name in names:
+                path = os.path.join(report_dir, name)
+                digest = blobs.get(name)
+                # Reports saved before the blob store, or whose blob was lost, are taken over as they are
+                if digest is None or not os.path.exists(self.blobs.path(digest)):
+                    if not os.path.exists(path):
+                        continue
+                    digest = self.blobs.adopt(path)
+                    blobs[name] = digest
+                    changed = True
+                    adopted += 1
+                counts[digest] = counts.get(digest, 0) + 1
+            if changed:
+                with conn:
+                    self._write_metadata(conn, meta)
+
+        self.blobs.recount(counts)
+        removed, freed = self.blobs.compact()
+        return {"adopted": adopted, "removed": removed, "freed_bytes": freed, **self.blobs.stats()}
+
+    def get_history(self, limit=None, offset=0):
+        """Return report metadata, newest first, one page at a time."""
+        rows = self._connect().execute(
+            "SELECT metadata FROM reports ORDER BY id DESC LIMIT ? OFFSET ?",
+            (limit if limit is not None else -1, offset),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def get_report(self, report_id):
+        row = self._connect().execute("SELECT metadata FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest_report(self, topic, max_age=None):
+        """Return the newest report on topic (case-insensitive), or None if there is none younger than max_age seconds."""
+        query = "SELECT metadata FROM reports WHERE topic = ? COLLATE NOCASE"
+        params = [topic.strip()]
+        if max_age is not None:
+            query += " AND date >= ?"
+            params.append((datetime.now() - timedelta(seconds=max_age)).strftime("%Y-%m-%d %H:%M:%S"))
+        row = self._connect().execute(query + " ORDER BY date DESC LIMIT 1", params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_report(self, report_id):
+        meta = self.get_report(report_id)
+        report_dir = os.path.join(self.history_dir, report_id)
+        if meta is None or not os.path.exists(report_dir):
+            return None
+
+        # Load content
+        with open(os.path.join(report_dir, "report.md"), "r", encoding="utf-8") as f:
+            content = f.read()
+
+        # Get chart paths
+        chart_paths = [os.path.join(report_dir, c) for c in meta["charts"]]
+        pdf_path = os.path.join(report_dir, "report.pdf") if meta["pdf"] else None
+
+        return content, chart_paths, pdf_path
+
+    def trace_path(self, report_id):
+        meta = self.get_report(report_id)
+        if meta is None or not meta.get("trace"):
+            return None
+        return os.path.join(self.history_dir, report_id, meta["trace"])
+
+    def search(self, query, limit=50):
+        """Return reports matching query, best match first, each with a text snippet."""
+        terms = re.findall(r"\w+", query.lower())
+        terms = [term for term in terms if term not in STOPWORDS] or terms
+        if not terms:
+            return []
+        if not self.fts:
+            rows = self._connect().execute(
+                "SELECT metadata FROM reports WHERE " + " AND ".join("lower(topic) LIKE ?" for _ in terms)
+                + " ORDER BY id DESC LIMIT ?",
+                [f"%{term}%" for term in terms] + [limit],
+            ).fetchall()
+            return [dict(json.loads(row[0]), snippet="") for row in rows]
+
+        # Quote every term so user input can never be read as FTS5 syntax; the last one
+        # matches as a prefix so results show up while the user is still typing.
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        conn = self._connect()
+        rowids = [row[0] for row in conn.execute(
+            "SELECT rowid FROM reports_fts WHERE reports_fts MATCH ? ORDER BY bm25(reports_fts, ?, 1.0) LIMIT ?",
+            (match, TOPIC_WEIGHT, limit),
+        )]
+        if not rowids:
+            return []
+
+        # Snippets are only built for the page being returned, not for every match
+        placeholders = ", ".join("?" for _ in rowids)
+        rows = conn.execute(
+            "SELECT reports_fts.rowid, r.metadata, snippet(reports_fts, 1, '', '', '...', 12) FROM reports_fts "
+            "JOIN reports r ON r.rowid = reports_fts.rowid "
+            f"WHERE reports_fts MATCH ? AND reports_fts.rowid IN ({placeholders})",
+            [match] + rowids,
+        ).fetchall()
+        found = {rowid: dict(json.loads(meta), snippet=" ".join(snippet.split())) for rowid, meta, snippet in rows}
+        return [found[rowid] for rowid in rowids if rowid in found]
+
+    def rebuild_index(self):
+        """Recreate the index from the metadata.json and report.md files on disk."""
+        reports = []
+        for report_id in os.listdir(self.history_dir):
+            report_dir = os.path.join(self.history_dir, report_id)
+            meta_path = os.path.join(report_dir, "metadata.json")
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        metadata = json.load(f)
+                    with open(os.path.join(report_dir, "report.md"), "r", encoding="utf-8") as f:
+                        content = f.read()
+                    reports.append((metadata, content))
+                except:
+                    continue
+
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM reports")
+            if self.fts:
+                conn.execute("DELETE FROM reports_fts")
+            for metadata, content in reports:
+                self._index(conn, metadata, content)
+        return len(reports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the report history archive")
+    parser.add_argument("command", choices=["rebuild", "search", "compact", "delete"],
+                        help="rebuild: re-index every report directory; search: query the full-text index; "
+                             "compact: deduplicate files and drop unused blobs; delete: remove a report")
+    parser.add_argument("query", nargs="?", default="", help="search terms, or the report ID to delete")
+    parser.add_argument("--dir", default=os.getenv("HISTORY_DIR", "history"), help="history directory")
+    args = parser.parse_args()
+
+    manager = HistoryManager(args.dir)
+    if args.command == "rebuild":
+        print(f"Indexed {manager.rebuild_index()} reports in {args.dir}")
+    elif args.command == "search":
+        for report in manager.search(args.query):
+            print(f"{report['id']}  {report['topic']}\n    {report['snippet']}")
+    elif args.command == "compact":
+        result = manager.compact()
+        print(
+            f"Adopted {result['adopted']} files, removed {result['removed']} blobs "
+            f"({result['freed_bytes'] / 1024 / 1024:.1f} MB); {result['blobs']} blobs "
+            f"({result['bytes'] / 1024 / 1024:.1f} MB) now back {result['refs']} files"
+        )
+    elif args.command == "delete":
+        print(f"Deleted {args.query}" if manager.delete_report(args.query) else f"No report {args.query}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .jobs import QueueFull, TERMINAL_STATES, discard_job_run, execute_job, percentile_summary
+from .registry import registry
+from .tools.rate_limit import rate_limit_stats
+
+JOB_COLUMNS = (
+    "id", "topic", "provider", "force_refresh", "status", "attempts", "max_attempts",
+    "created_at", "available_at", "started_at", "finished_at", "lease_owner", "lease_expires",
+    "report_id", "error",
+)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Durable job queue in SQLite, shared by any number of worker processes on one host.
+
+    The database runs in WAL mode, whose locking only works between processes on
+    the same machine, so it must not be shared with workers elsewhere.
+
+    A worker claims a job by taking a lease on it and renews the lease while the
+    report runs. When a worker dies its lease runs out and the job goes to the
+    next worker that asks, until max_attempts is used up. Progress events are
+    stored next to the jobs, so any process can stream them. Offers the same
+    interface as JobManager, so the HTTP API can serve either.
+    """
+
+    def __init__(self, path, max_queue=None, max_attempts=None, retry_delay=None, keep_seconds=None):
+        self.path = path
+        self.max_queue = max_queue or int(os.getenv("JOB_QUEUE_SIZE", 100))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+        self.retry_delay = retry_delay if retry_delay is not None else float(os.getenv("JOB_RETRY_DELAY", 30))
+        self.keep_seconds = keep_seconds or float(os.getenv("JOB_RETENTION", 7 * 24 * 60 * 60))
+        # Polling interval for event streams, other processes cannot notify us
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+        self.rejected = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with self._transaction():
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, topic TEXT NOT NULL, provider TEXT NOT NULL, force_refresh INTEGER NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, available_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "lease_owner TEXT, lease_expires REAL, report_id TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, available_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (job_id, seq))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit, transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # Takes the write lock up front, so two workers never claim the same job
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _emit(self, conn, job_id, event, data):
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        conn.execute(
+            "INSERT INTO job_events (job_id, seq, event, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, seq, event, json.dumps(data, default=str), time.time()),
+        )
+
+    def _row(self, conn, job_id):
+        row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+    @staticmethod
+    def _public(job):
+        return {
+            "id": job["id"],
+            "topic": job["topic"],
+            "provider": job["provider"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "report_id": job["report_id"],
+            "error": job["error"],
+            "attempts": job["attempts"],
+            "worker": job["lease_owner"],
+        }
+
+    def submit(self, topic, provider="gemini", force_refresh=False):
+        job_id = uuid.uuid4().hex[:16]
+        now = time.time()
+        with self._transaction() as conn:
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if depth >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"Job queue is full ({self.max_queue} waiting)")
+            conn.execute(
+                "INSERT INTO jobs (id, topic, provider, force_refresh, status, max_attempts, created_at, available_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, topic, provider, int(bool(force_refresh)), self.max_attempts, now, now),
+            )
+            self._emit(conn, job_id, "status", {"status": "queued", "queue_depth": depth + 1})
+            job = self._row(conn, job_id)
+        print(f"--- Job Queue: Queued {job_id} '{topic}' ({provider}) ---")
+        return self._public(job)
+
+    def claim(self, worker_id, lease_seconds):
+        """Lease the next runnable job to worker_id and return it, or None when there is nothing to do."""
+        now = time.time()
+        job = None
+        with self._transaction() as conn:
+            # Jobs whose worker died on the last attempt fail instead of coming back
+            dead = conn.execute(
+                "SELECT id, lease_owner, attempts FROM jobs "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now,)
+            ).fetchall()
+            for job_id, owner, attempts in dead:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL, lease_expires = NULL, "
+                    "error = ? WHERE id = ?",
+                    (now, f"Worker {owner} stopped responding ({attempts} attempts)", job_id),
+                )
+                self._emit(conn, job_id, "failed", self._public(self._row(conn, job_id)))
+
+            row = conn.execute(
+                "SELECT id, status, lease_owner FROM jobs "
+                "WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY available_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                job_id, status, previous = row
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, job_id),
+                )
+                job = self._row(conn, job_id)
+                data = {"status": "running", "worker": worker_id, "attempt": job["attempts"], "waited": round(now - job["created_at"], 3)}
+                if status == "running":
+                    data["recovered_from"] = previous
+                self._emit(conn, job_id, "status", data)
+
+        # The dead worker never cleans up, and once the failure is committed no one will retry these jobs
+        for dead_id, _, _ in dead:
+            discard_job_run(dead_id)
+        if job is not None and status == "running":
+            print(f"--- Job Queue: Lease of {previous} on {job['id']} expired, retrying on {worker_id} ---")
+        return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        """Extend the lease; False when the job is no longer ours (it expired and was handed on)."""
+        return self._connect().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (time.time() + lease_seconds, job_id, worker_id),
+        ).rowcount == 1
+
+    def add_event(self, job_id, event, data):
+        with self._transaction() as conn:
+            self._emit(conn, job_id, event, data)
+
+    def complete(self, job_id, worker_id, report_id):
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'done', report_id = ?, error = NULL, finished_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (report_id, time.time(), job_id, worker_id),
+            ).rowcount
+            if updated:
+                self._emit(conn, job_id, "done", self._public(self._row(conn, job_id)))
+        return bool(updated)
+
+    def fail(self, job_id, worker_id, error):
+        """Requeue the job with exponential backoff, or fail it once its attempts are used up.
+
+        Returns the job's new status, or None when the job is no longer leased to worker_id.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            job = self._row(conn, job_id)
+            if job is None or job["lease_owner"] != worker_id or job["status"] != "running":
+                return None
+            if job["attempts"] < job["max_attempts"]:
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', available_at = ?, error = ?, "
+                    "lease_owner = NULL, lease_expires = NULL WHERE id = ?",
+                    (now + delay, error, job_id),
+                )
+                self._emit(conn, job_id, "status", {"status": "queued", "retry_in": delay, "error": error})
+                return "queued"
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, "
+                    "lease_owner = NULL, lease_expires = NULL WHERE id = ?",
+                    (error, now, job_id),
+                )
+                self._emit(conn, job_id, "failed", self._public(self._row(conn, job_id)))
+                return "failed"
+
+    def get(self, job_id):
+        job = self._row(self._connect(), job_id)
+        return self._public(job) if job else None
+
+    def list(self, limit=50):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._public(dict(zip(JOB_COLUMNS, row))) for row in rows]
+
+    def wait_events(self, job_id, after=0, timeout=15.0):
+        """Return (events after the given id, finished), polling up to timeout for new ones; None if the job is unknown."""
+        conn = self._connect()
+        deadline = time.monotonic() + timeout
+        while True:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+            finished = row[0] in TERMINAL_STATES
+            if rows or finished or time.monotonic() >= deadline:
+                return [(seq, event, json.loads(data)) for seq, event, data in rows], finished
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+    def metrics(self):
+        now = time.time()
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        waits = [row[0] for row in conn.execute(
+            "SELECT started_at - created_at FROM jobs WHERE started_at IS NOT NULL ORDER BY started_at DESC LIMIT 1000"
+        )]
+        durations = [row[0] for row in conn.execute(
+            "SELECT finished_at - started_at FROM jobs WHERE status = 'done' ORDER BY finished_at DESC LIMIT 1000"
+        )]
+        workers = conn.execute(
+            "SELECT COUNT(DISTINCT lease_owner) FROM jobs WHERE status = 'running' AND lease_expires >= ?", (now,)
+        ).fetchone()[0]
+        retries = conn.execute("SELECT COALESCE(SUM(attempts - 1), 0) FROM jobs WHERE attempts > 1").fetchone()[0]
+        return {
+            "workers": workers,
+            "queue_depth": counts.get("queued", 0),
+            "queue_capacity": self.max_queue,
+            "running": counts.get("running", 0),
+            "completed": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "rejected": self.rejected,
+            "retries": retries,
+            "oldest_queued_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "wait_seconds": percentile_summary(waits),
+            "run_seconds": percentile_summary(durations),
+            "rate_limits": rate_limit_stats(),
+            "graphs": registry.stats(),
+        }
+
+    def gc(self, max_age=None):
+        """Drop finished jobs, and their events, older than max_age seconds."""
+        cutoff = time.time() - (max_age if max_age is not None else self.keep_seconds)
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN "
+                "(SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?)", (cutoff,)
+            )
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            ).rowcount
+
+    def shutdown(self, wait=True):
+        # Jobs outlive the process; queued and running ones are picked up by the next worker
+        pass
+
+
+class QueueWorker:
+    """Pulls jobs from a JobQueue and runs them, renewing the lease in the background."""
+
+    def __init__(self, job_queue, history_manager, worker_id=None, lease_seconds=None, poll_interval=None):
+        self.queue = job_queue
+        self.history_manager = history_manager
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_LEASE_SECONDS", 120))
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+        self.processed = 0
+
+    def run(self, stop_event, once=False):
+        """Work until stop_event is set, or with once=True until the queue is empty."""
+        while not stop_event.is_set():
+            job = self.queue.claim(self.worker_id, self.lease_seconds)
+            if job is None:
+                if once:
+                    return
+                stop_event.wait(self.poll_interval)
+                continue
+            self.process(job)
+
+    def process(self, job):
+        job_id = job["id"]
+        print(f"--- Worker {self.worker_id}: Running {job_id} '{job['topic']}' (attempt {job['attempts']}) ---")
+        lost = threading.Event()
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_seconds / 3):
+                if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                    print(f"--- Worker {self.worker_id}: Lost the lease on {job_id} ---")
+                    lost.set()
+                    return
+
+        def still_owned():
+            # Renews the lease as it checks, so the step that follows starts with a full lease
+            if not lost.is_set() and not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                print(f"--- Worker {self.worker_id}: Lost the lease on {job_id} ---")
+                lost.set()
+            return not lost.is_set()
+
+        threading.Thread(target=renew, name=f"lease-{job_id}", daemon=True).start()
+        try:
+            report_id = execute_job(
+                job_id, job["topic"], job["provider"], bool(job["force_refresh"]), self.history_manager,
+                emit=lambda event, data: self.queue.add_event(job_id, event, data),
+                still_owned=still_owned,
+            )
+        except Exception as e:
+            print(f"--- Worker {self.worker_id}: {job_id} failed: {e} ---")
+            # A requeued job keeps its workspace and checkpoint for the retry, and a job
+            # taken over by another worker is that worker's to clean up
+            if self.queue.fail(job_id, self.worker_id, str(e)) == "failed":
+                discard_job_run(job_id)
+        else:
+            if self.queue.complete(job_id, self.worker_id, report_id):
+                discard_job_run(job_id)
+        finally:
+            done.set()
+            self.processed += 1
+
+
+def start_workers(job_queue, history_manager, count, stop_event, worker_id=None, lease_seconds=None, once=False):
+    """Start count worker threads on job_queue and return them."""
+    worker_id = worker_id or default_worker_id()
+    threads = []
+    for idx in range(count):
+        worker = QueueWorker(job_queue, history_manager, f"{worker_id}/{idx}", lease_seconds)
+        thread = threading.Thread(target=worker.run, args=(stop_event, once), name=f"queue-worker-{idx}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,266 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from .checkpoints import get_checkpoint_store
+from .registry import get_graph, registry
+from .tools.rate_limit import rate_limit_stats
+from .tracing import TRACE_FILE
+from .workspace import Workspace
+
+TERMINAL_STATES = ("done", "failed")
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class LeaseLost(Exception):
+    """Raised when another worker took over a job while it was still running here."""
+
+
+def percentile_summary(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "p50": round(ordered[int(0.50 * (len(ordered) - 1))], 3),
+        "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def node_summary(node, update):
+    """Small, JSON-safe view of a node update for progress events (the full state stays server-side)."""
+    update = update or {}
+    data = {"node": node}
+    if "research_data" in update:
+        data["sources"] = len(update["research_data"] or [])
+    if "analysis" in update:
+        data["analysis_chars"] = len(update["analysis"] or "")
+    if "feedback" in update:
+        data["approved"] = not update["feedback"]
+        if update["feedback"]:
+            data["feedback"] = update["feedback"]
+    if "revision_count" in update:
+        data["revision_count"] = update["revision_count"]
+    if "chart_files" in update:
+        data["charts"] = [os.path.basename(path) for path in update["chart_files"] or []]
+    if "final_report" in update:
+        data["report_chars"] = len(update["final_report"] or "")
+    return data
+
+
+def execute_job(job_id, topic, provider, force_refresh, history_manager, emit, still_owned=None):
+    """Run one report job, reporting node progress through emit(event, data), and archive it; return the report ID.
+
+    The job ID is used as the run ID, so a retried job resumes from the checkpoint
+    its previous attempt left behind instead of starting over. The workspace and
+    checkpoint are therefore kept; call discard_job_run once the job is finished.
+    """
+    workspace = Workspace(run_id=job_id)
+    graph = get_graph(provider)
+    # A resumed run only streams the nodes still to go, the rest of its state is in the checkpoint
+    checkpoint = graph.checkpoints.load(job_id) if graph.checkpoints is not None else None
+    state = dict(checkpoint["state"]) if checkpoint else {}
+    for node, update in graph.run_stream(topic, force_refresh, workspace):
+        state.update(update or {})
+        # Another worker now owns the job and its workspace, stop before touching them again
+        if still_owned is not None and not still_owned():
+            raise LeaseLost(f"Job {job_id} was taken over by another worker")
+        emit("node", node_summary(node, update))
+    # Archiving is the one step a worker that lost the job must not repeat, or the report is saved twice
+    if still_owned is not None and not still_owned():
+        raise LeaseLost(f"Job {job_id} was taken over by another worker")
+    return history_manager.save_report(
+        topic, state.get("final_report", ""), state.get("chart_files", []),
+        trace_path=workspace.file(TRACE_FILE),
+    )
+
+
+def discard_job_run(job_id):
+    """Remove the workspace and checkpoint of a job that will not run again."""
+    Workspace(run_id=job_id).cleanup()
+    checkpoints = get_checkpoint_store()
+    if checkpoints is not None:
+        checkpoints.delete(job_id)
+
+
+class Job:
+    def __init__(self, topic, provider="gemini", force_refresh=False, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:16]
+        self.topic = topic
+        self.provider = provider
+        self.force_refresh = force_refresh
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.report_id = None
+        self.error = None
+        # (id, event, data), ids start at 1 so SSE clients can resume with Last-Event-ID
+        self.events = []
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "provider": self.provider,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "report_id": self.report_id,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs report jobs on a fixed pool of worker threads fed by a bounded queue.
+
+    Jobs and their progress events live in memory, the finished reports in the
+    history. Submitting to a full queue raises QueueFull instead of piling up
+    work the pool cannot get to.
+    """
+
+    def __init__(self, history_manager, workers=None, max_queue=None, keep=None):
+        self.history_manager = history_manager
+        self.workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", 4))
+        if self.workers < 1:
+            raise ValueError("JobManager needs at least one worker")
+        self.max_queue = max_queue or int(os.getenv("JOB_QUEUE_SIZE", 100))
+        self.keep = keep or int(os.getenv("JOB_HISTORY_SIZE", 1000))
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=1000)
+        self._durations = deque(maxlen=1000)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{idx}", daemon=True)
+            for idx in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _emit(self, job, event, data):
+        # Callers hold self._cond
+        job.events.append((len(job.events) + 1, event, data))
+        self._cond.notify_all()
+
+    def _evict(self):
+        # Forget the oldest finished jobs; their reports stay in the history
+        excess = len(self._jobs) - self.keep
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATES][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def submit(self, topic, provider="gemini", force_refresh=False):
+        job = Job(topic, provider, force_refresh)
+        with self._cond:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull(f"Job queue is full ({self.max_queue} waiting)")
+            self._jobs[job.id] = job
+            self._emit(job, "status", {"status": "queued", "queue_depth": self._queue.qsize()})
+            self._evict()
+        print(f"--- Jobs: Queued {job.id} '{topic}' ({provider}) ---")
+        return job.to_dict()
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self, limit=50):
+        with self._cond:
+            return [job.to_dict() for job in reversed(list(self._jobs.values())[-limit:])]
+
+    def wait_events(self, job_id, after=0, timeout=15.0):
+        """Return (events after the given id, finished), waiting up to timeout for new ones; None if the job is unknown."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._cond.wait_for(lambda: len(job.events) > after or job.status in TERMINAL_STATES, timeout)
+            return job.events[after:], job.status in TERMINAL_STATES
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        with self._cond:
+            job.status = "running"
+            job.started_at = time.time()
+            self.running += 1
+            self._waits.append(job.started_at - job.created_at)
+            self._emit(job, "status", {"status": "running", "waited": round(job.started_at - job.created_at, 3)})
+        print(f"--- Jobs: Running {job.id} '{job.topic}' ---")
+
+        def emit(event, data):
+            with self._cond:
+                self._emit(job, event, data)
+
+        try:
+            report_id = execute_job(job.id, job.topic, job.provider, job.force_refresh, self.history_manager, emit)
+        except Exception as e:
+            print(f"--- Jobs: {job.id} failed: {e} ---")
+            self._finish(job, "failed", error=str(e))
+        else:
+            self._finish(job, "done", report_id=report_id)
+        finally:
+            # In-memory jobs are never retried
+            discard_job_run(job.id)
+
+    def _finish(self, job, status, report_id=None, error=None):
+        with self._cond:
+            job.status = status
+            job.finished_at = time.time()
+            job.report_id = report_id
+            job.error = error
+            self.running -= 1
+            if status == "done":
+                self.completed += 1
+                self._durations.append(job.finished_at - job.started_at)
+            else:
+                self.failed += 1
+            self._emit(job, status, job.to_dict())
+
+    def metrics(self):
+        with self._cond:
+            metrics = {
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "wait_seconds": percentile_summary(self._waits),
+                "run_seconds": percentile_summary(self._durations),
+            }
+        metrics["rate_limits"] = rate_limit_stats()
+        metrics["graphs"] = registry.stats()
+        return metrics
+
+    def shutdown(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
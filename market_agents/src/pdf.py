@@ -0,0 +1,237 @@
+import asyncio
+import atexit
+import hashlib
+import io
+import multiprocessing as mp
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from .document import parse_report
+
+# Charts are drawn 170mm wide, so ~1000px is already 150 DPI on paper
+PDF_IMAGE_WIDTH = int(os.getenv("PDF_IMAGE_WIDTH", 1000))
+IMAGE_CACHE_SIZE = 128
+
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def _chart_image(path):
+    """Return the chart downscaled for print, cached by the hash of the original file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    key = hashlib.sha256(data).hexdigest()
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return io.BytesIO(_image_cache[key])
+
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if image.width > PDF_IMAGE_WIDTH:
+        image.thumbnail((PDF_IMAGE_WIDTH, image.height))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        data = buffer.getvalue()
+
+    with _image_cache_lock:
+        _image_cache[key] = data
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+    return io.BytesIO(data)
+
+
+# Typographic characters the core PDF fonts cannot encode
+_REPLACEMENTS = str.maketrans({
+    '\u2018': "'", '\u2019': "'",
+    '\u201c': '"', '\u201d': '"',
+    '\u2013': '-', '\u2014': '-',
+    '\u2026': '...',
+    '\u00a0': ' ',
+})
+
+
+def _pdf_text(text):
+    return text.translate(_REPLACEMENTS).encode('latin-1', 'replace').decode('latin-1')
+
+
+class ReportPDF(FPDF):
+    def __init__(self, topic, date=None):
+        super().__init__()
+        self.topic = topic
+        self.date = date or datetime.now()
+        self.set_auto_page_break(auto=True, margin=20)
+        self.set_margins(20, 20, 20)
+        
+    def header(self):
+        if self.page_no() > 1:
+            self.set_draw_color(226, 232, 240) 
+            self.line(20, 25, 190, 25)
+            
+            self.set_y(15)
+            self.set_font('helvetica', 'B', 9)
+            self.set_text_color(100, 116, 139)  # Slate-500
+            self.cell(0, 10, 'MARKET INTELLIGENCE REPORT', new_x=XPos.RIGHT, new_y=YPos.TOP, align='L')
+            
+            self.set_font('helvetica', '', 9)
+            self.cell(0, 10, self.date.strftime('%Y-%m-%d'), new_x=XPos.RIGHT, new_y=YPos.TOP, align='R')
+            self.ln(15)
+    
+    def footer(self):
+        if self.page_no() > 1:
+            self.set_y(-20)
+            self.set_draw_color(226, 232, 240)
+            self.line(20, 275, 190, 275)
+            
+            self.set_y(-15)
+            self.set_font('helvetica', '', 8)
+            self.set_text_color(148, 163, 184)  # Slate-400
+            self.cell(0, 10, f'Page {self.page_no()}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
+            self.set_text_color(0, 0, 0)
+    
+    def add_cover_page(self):
+        self.add_page()
+        
+        # Geometric Background
+        self.set_fill_color(99, 102, 241)  # Indigo-500
+        self.rect(0, 0, 210, 297, 'F')
+        
+        # White Content Card
+        self.set_fill_color(255, 255, 255)
+        self.rect(20, 40, 170, 217, 'F')
+        
+        # Decorative Accent
+        self.set_fill_color(79, 70, 229)  # Indigo-600
+        self.rect(20, 40, 170, 10, 'F')
+        
+        # Content
+        self.set_y(80)
+        self.set_text_color(30, 41, 59)  # Slate-800
+        self.set_font('helvetica', 'B', 32)
+        self.multi_cell(0, 14, 'MARKET\nRESEARCH\nREPORT', 0, 'C')
+        
+        self.ln(20)
+        self.set_draw_color(99, 102, 241)
+        self.set_line_width(1)
+        self.line(70, self.get_y(), 140, self.get_y())
+        
+        self.ln(20)
+        self.set_font('helvetica', '', 16)
+        self.set_text_color(71, 85, 105)  # Slate-600
+        self.multi_cell(0, 10, self.topic, 0, 'C')
+        
+        # Footer Info
+        self.set_y(220)
+        self.set_font('helvetica', 'B', 10)
+        self.set_text_color(148, 163, 184)
+        self.cell(0, 6, 'PREPARED BY', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+        self.set_font('helvetica', '', 12)
+        self.set_text_color(30, 41, 59)
+        self.cell(0, 8, 'AI Market Agents System', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+        self.ln(2)
+        self.set_font('helvetica', '', 10)
+        self.set_text_color(100, 116, 139)
+        self.cell(0, 6, self.date.strftime('%B %d, %Y'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+
+def build_pdf(markdown_content, chart_paths, topic="Market Research", date=None):
+    """Render the report to PDF and return the document as bytes."""
+    if not markdown_content:
+        return None
+    
+    document = parse_report(markdown_content)
+    
+    pdf = ReportPDF(topic, date)
+    pdf.add_cover_page()
+    pdf.add_page()
+    
+    # Executive Summary Styling
+    pdf.set_font('helvetica', 'B', 14)
+    pdf.set_text_color(79, 70, 229)  # Indigo-600
+    pdf.cell(0, 10, 'EXECUTIVE SUMMARY', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.ln(2)
+    
+    # Intro/Exec Summary
+    if document.intro.text:
+        pdf.set_font('helvetica', '', 11)
+        pdf.set_text_color(51, 65, 85)  # Slate-700
+        pdf.multi_cell(0, 6, _pdf_text(document.intro.text))
+        pdf.ln(10)
+    
+    for section in document.sections:
+        if 'visualization' in section.title.lower():
+            continue
+        
+        # Section Header
+        if pdf.get_y() > 250: pdf.add_page()
+        
+        pdf.set_font('helvetica', 'B', 14)
+        pdf.set_text_color(79, 70, 229)
+        pdf.cell(0, 10, _pdf_text(section.title.upper()), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+        pdf.set_draw_color(226, 232, 240)
+        pdf.line(20, pdf.get_y(), 190, pdf.get_y())
+        pdf.ln(5)
+        
+        # Content
+        pdf.set_font('helvetica', '', 11)
+        pdf.set_text_color(51, 65, 85)
+        pdf.multi_cell(0, 6, _pdf_text(section.text))
+        pdf.ln(8)
+    
+    # Visualizations Section
+    if chart_paths:
+        pdf.add_page()
+        pdf.set_font('helvetica', 'B', 14)
+        pdf.set_text_color(79, 70, 229)
+        pdf.cell(0, 10, 'DATA VISUALIZATIONS', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+        pdf.line(20, pdf.get_y(), 190, pdf.get_y())
+        pdf.ln(10)
+        
+        captions = document.image_captions()
+        for idx, chart_path in enumerate(chart_paths):
+            if os.path.exists(chart_path):
+                if pdf.get_y() > 180: pdf.add_page()
+                
+                pdf.set_font('helvetica', 'B', 10)
+                pdf.set_text_color(100, 116, 139)
+                caption = captions.get(os.path.basename(chart_path)) or 'Market Analysis Chart'
+                pdf.cell(0, 8, _pdf_text(f'Figure {idx + 1}: {caption}'), new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+                
+                try:
+                    img_width = 170
+                    x_pos = (pdf.w - img_width) / 2
+                    pdf.image(_chart_image(chart_path), x=x_pos, w=img_width)
+                    pdf.ln(10)
+                except Exception as e:
+                    print(f"Error adding chart: {e}")
+    
+    return bytes(pdf.output())
+
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+
+def get_pdf_executor():
+    """Return the process pool PDFs are built in, so layout work never blocks the event loop or the GIL."""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=int(os.getenv("PDF_WORKERS", 2)),
+                mp_context=mp.get_context("spawn"),
+            )
+            atexit.register(_pdf_executor.shutdown, wait=False, cancel_futures=True)
+        return _pdf_executor
+
+
+async def abuild_pdf(markdown_content, chart_paths, topic="Market Research", date=None):
+    """Build the PDF bytes in the worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pdf_executor(), build_pdf, markdown_content, chart_paths, topic, date)
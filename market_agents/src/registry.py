@@ -0,0 +1,60 @@
+import threading
+
+from .graph import MarketResearchGraph, DEFAULT_MODELS
+
+
+class GraphRegistry:
+    """Process-wide pool of MarketResearchGraph instances keyed by provider and model.
+
+    Each entry owns one LLM client, one search tool and one compiled graph, all of
+    which are safe to share between concurrent runs.
+    """
+
+    def __init__(self, factory=MarketResearchGraph):
+        self.factory = factory
+        self._graphs = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, model_provider="gemini", model=None):
+        model = model or DEFAULT_MODELS.get(model_provider, DEFAULT_MODELS["gemini"])
+        key = (model_provider, model)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self.hits += 1
+                return graph
+
+            print(f"--- Registry: Building graph for {model_provider}/{model} ---")
+            graph = self.factory(model_provider=model_provider, model=model)
+            graph.get_app()
+            self._graphs[key] = graph
+            self.builds += 1
+            return graph
+
+    def register(self, graph):
+        """Serve an already built graph for its provider and model, e.g. one wired to stand-in backends."""
+        with self._lock:
+            self._graphs[(graph.model_provider, graph.model)] = graph
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "builds": self.builds,
+                "size": len(self._graphs),
+                "keys": [f"{provider}/{model}" for provider, model in self._graphs],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+
+
+registry = GraphRegistry()
+
+
+def get_graph(model_provider="gemini", model=None):
+    """Return the shared graph for a provider, building it on first request."""
+    return registry.get(model_provider, model)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteCache:
+    """Small key/value cache stored in SQLite with TTL expiry and LRU eviction.
+
+    Every thread gets its own connection and the database runs in WAL mode, so
+    several threads and processes can share one cache file.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(False)
+            return default
+
+        value, created_at = row
+        if self.ttl is not None and now - created_at > self.ttl:
+            with conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(False)
+            return default
+
+        with conn:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return json.loads(value)
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def purge_expired(self):
+        if self.ttl is None:
+            return 0
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+
+def normalize_query(query):
+    """Collapse case and whitespace so trivially different queries share an entry."""
+    return " ".join(query.lower().split())
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Return the process-wide search cache, or None when SEARCH_CACHE_ENABLED is off."""
+    global _search_cache
+    if os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SQLiteCache(
+                os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search.sqlite3")),
+                ttl=float(os.getenv("SEARCH_CACHE_TTL", 6 * 60 * 60)),
+                max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 5000)),
+            )
+        return _search_cache
+
+
+class LLMCache:
+    """Content-addressed cache of LLM responses with hit rates tracked per node."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.node_stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider, model, temperature, prompt):
+        payload = json.dumps([provider, model, temperature, prompt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, node, hit):
+        with self._lock:
+            stats = self.node_stats.setdefault(node, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def get(self, node, key):
+        value = self.cache.get(key)
+        self._count(node, value is not None)
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def stats(self):
+        with self._lock:
+            nodes = {
+                node: dict(counts, hit_rate=counts["hits"] / (counts["hits"] + counts["misses"]))
+                for node, counts in self.node_stats.items()
+            }
+        return {"nodes": nodes, **self.cache.stats()}
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache, or None unless LLM_CACHE_ENABLED is set."""
+    global _llm_cache
+    if os.getenv("LLM_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache(SQLiteCache(
+                os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm.sqlite3")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60)),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000)),
+            ))
+        return _llm_cache
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(KeyError):
+    """Raised on replay when the cassette holds no response for a request."""
+
+
+def _message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+
+class Cassette:
+    """Recorded search and LLM interactions of one or more runs, stored as gzipped JSON.
+
+    In "record" mode the real backends are wrapped and every request/response pair
+    is appended to a plain JSONL log next to the cassette as it happens; save()
+    (called at exit too) compacts the log into the cassette. In "replay" mode the recorded responses
+    are served instead, so a run is reproduced offline and deterministically. A
+    request recorded several times is answered in recording order, and the last
+    answer is repeated once they run out.
+    """
+
+    def __init__(self, path, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.meta = {}
+        self.interactions = []
+        self._served = {}
+        self._lock = threading.Lock()
+        self._log = None
+        if mode == "replay" or os.path.exists(path) or os.path.exists(self.log_path):
+            self._load()
+        self._index()
+        if mode == "record":
+            atexit.register(self._save_pending)
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @property
+    def log_path(self):
+        return f"{self.path}.log"
+
+    @staticmethod
+    def make_key(kind, request):
+        return hashlib.sha256(f"{kind}\n{request}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if os.path.exists(self.path) or not os.path.exists(self.log_path):
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"{self.path}: unsupported cassette version {data.get('version')}")
+            self.meta = data.get("meta", {})
+            self.interactions = data.get("interactions", [])
+        if os.path.exists(self.log_path):
+            # Calls recorded since the last save, e.g. by a run that crashed
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.interactions.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A write cut short by the crash
+                        break
+
+    def _index(self):
+        self._responses = {}
+        for interaction in self.interactions:
+            self._responses.setdefault(interaction["key"], []).append(interaction["response"])
+
+    def save(self):
+        """Write the cassette with everything recorded so far and drop the log."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"version": CASSETTE_VERSION, "meta": self.meta, "interactions": self.interactions}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+
+    def _save_pending(self):
+        if self._log is not None:
+            self.save()
+
+    def record(self, kind, request, response):
+        key = self.make_key(kind, request)
+        interaction = {"kind": kind, "key": key, "request": request, "response": response}
+        line = json.dumps(interaction, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.interactions.append(interaction)
+            self._responses.setdefault(key, []).append(response)
+            if self._log is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._log = open(self.log_path, "a", encoding="utf-8")
+            # One appended line per call, so a crashed run still leaves its calls behind
+            self._log.write(line)
+            self._log.flush()
+
+    def play(self, kind, request):
+        key = self.make_key(kind, request)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise CassetteMiss(f"No recorded {kind} response for: {request[:120]!r}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return responses[min(served, len(responses) - 1)]
+
+    def llm(self, llm=None):
+        return ReplayLLM(self) if self.replaying else RecordingLLM(llm, self)
+
+    def search(self, search_tool=None):
+        return ReplaySearch(self) if self.replaying else RecordingSearch(search_tool, self)
+
+
+def _llm_payload(response):
+    usage = getattr(response, "usage_metadata", None)
+    return {"content": response.content, "usage": usage if isinstance(usage, dict) else None}
+
+
+def _llm_message(payload):
+    from langchain_core.messages import AIMessage
+    return AIMessage(content=payload["content"], usage_metadata=payload.get("usage"))
+
+
+class RecordingLLM:
+    def __init__(self, llm, cassette):
+        self.llm = llm
+        self.cassette = cassette
+        self.temperature = getattr(llm, "temperature", None)
+
+    def invoke(self, messages, *args, **kwargs):
+        response = self.llm.invoke(messages, *args, **kwargs)
+        self.cassette.record("llm", _message_text(messages), _llm_payload(response))
+        return response
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        response = await self.llm.ainvoke(messages, *args, **kwargs)
+        await asyncio.to_thread(self.cassette.record, "llm", _message_text(messages), _llm_payload(response))
+        return response
+
+
+class ReplayLLM:
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.temperature = cassette.meta.get("temperature")
+
+    def invoke(self, messages, *args, **kwargs):
+        return _llm_message(self.cassette.play("llm", _message_text(messages)))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return self.invoke(messages)
+
+
+class RecordingSearch:
+    def __init__(self, search_tool, cassette):
+        self.search_tool = search_tool
+        self.cassette = cassette
+
+    def invoke(self, query, *args, **kwargs):
+        results = self.search_tool.invoke(query, *args, **kwargs)
+        self.cassette.record("search", str(query), results)
+        return results
+
+    async def ainvoke(self, query, *args, **kwargs):
+        results = await self.search_tool.ainvoke(query, *args, **kwargs)
+        await asyncio.to_thread(self.cassette.record, "search", str(query), results)
+        return results
+
+
+class ReplaySearch:
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    def invoke(self, query, *args, **kwargs):
+        return self.cassette.play("search", str(query))
+
+    async def ainvoke(self, query, *args, **kwargs):
+        return self.invoke(query)
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Return the process-wide cassette when CASSETTE_MODE is "record" or "replay", else None."""
+    global _cassette
+    mode = os.getenv("CASSETTE_MODE", "").lower()
+    if mode not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(os.getenv("CASSETTE_PATH", os.path.join("cassettes", "run.json.gz")), mode)
+        return _cassette
+
+
+def main():
+    from ..graph import MarketResearchGraph
+    from ..history import HistoryManager
+    from ..pdf import build_pdf
+    from ..workspace import Workspace
+    from .chart_pool import get_chart_pool
+
+    parser = argparse.ArgumentParser(description="Record a report run to a cassette, or replay one offline")
+    parser.add_argument("command", choices=["record", "replay"])
+    parser.add_argument("cassette", help="cassette file (.json.gz)")
+    parser.add_argument("topic", nargs="?", help="topic to record (replay uses the recorded topic)")
+    parser.add_argument("--provider", default="gemini", choices=["gemini", "openai"])
+    parser.add_argument("--history-dir", help="also archive the report here, as the app does")
+    parser.add_argument("--pdf", action="store_true", help="also build the PDF")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the run this many times")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, args.command)
+    if args.command == "record":
+        if not args.topic:
+            parser.error("record needs a topic")
+        cassette.meta.update(topic=args.topic, provider=args.provider)
+    topic = args.topic or cassette.meta.get("topic")
+    provider = cassette.meta.get("provider", args.provider)
+    history_manager = HistoryManager(args.history_dir) if args.history_dir else None
+
+    # Prompts depend on the research and chart modes, so a replay uses the recorded ones
+    graph = MarketResearchGraph(model_provider=provider, cassette=cassette, research_mode=cassette.meta.get("research_mode"))
+    graph.chart_mode = cassette.meta.get("chart_mode", graph.chart_mode)
+    if args.command == "record":
+        cassette.meta.update(
+            model=graph.model, temperature=graph.llm.temperature,
+            research_mode=graph.research_mode, chart_mode=graph.chart_mode,
+        )
+        cassette.save()
+    else:
+        # Compile the graph (importing langgraph) and start the chart workers up front,
+        # so the timings below cover the run alone
+        started = time.perf_counter()
+        graph.get_app()
+        (graph.chart_pool or get_chart_pool()).wait_ready()
+        print(f"Graph and chart pool ready in {time.perf_counter() - started:.2f}s")
+
+    for _ in range(args.repeat if args.command == "replay" else 1):
+        started = time.perf_counter()
+        workspace = Workspace()
+        try:
+            state = graph.run(topic, workspace=workspace)
+            graph_time = time.perf_counter() - started
+            pdf_data = build_pdf(state["final_report"], state["chart_files"], topic) if args.pdf else None
+            if history_manager is not None:
+                report_id = history_manager.save_report(topic, state["final_report"], state["chart_files"], pdf_data)
+                print(f"Saved report {report_id}")
+        finally:
+            workspace.cleanup()
+        print(
+            f"{args.command}: '{topic}' in {time.perf_counter() - started:.2f}s (graph {graph_time:.2f}s), "
+            f"{len(cassette.interactions)} interactions, {len(state['final_report'])} chars"
+        )
+    if args.command == "record":
+        cassette.save()
+
+
+if __name__ == "__main__":
+    main()
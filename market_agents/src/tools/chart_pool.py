@@ -0,0 +1,264 @@
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .charts import render_chart_safe, spec_key
+
+
+class ChartRenderError(Exception):
+    pass
+
+
+class ChartTimeoutError(ChartRenderError):
+    pass
+
+
+def _limit_memory(memory_limit_mb):
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = int(memory_limit_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_code(code):
+    import matplotlib.pyplot as plt
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Each worker runs one job at a time, so changing directory is safe here and
+        # catches scripts that save relative to the CWD instead of OUTPUT_DIR.
+        os.chdir(output_dir)
+        error = None
+        try:
+            exec(code, {"plt": plt, "os": os, "OUTPUT_DIR": output_dir, "__name__": "__chart__"})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            plt.close("all")
+            os.chdir(previous_dir)
+
+        charts = []
+        images = sorted(f for f in os.listdir(output_dir) if f.lower().endswith(".png"))
+        for idx, name in enumerate(images, start=1):
+            with open(os.path.join(output_dir, name), "rb") as f:
+                charts.append((f"chart_{idx}.png", f.read()))
+    return charts, error
+
+
+def _worker_main(conn, memory_limit_mb):
+    _limit_memory(memory_limit_mb)
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401  warm the import before the first job
+
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        kind, payload = job
+        try:
+            if kind == "specs":
+                conn.send(([render_chart_safe(spec) for spec in payload], None))
+            else:
+                conn.send(_run_code(payload))
+        except MemoryError:
+            # One slot per spec, so the caller can count every spec of the batch as failed
+            charts = [None] * len(payload) if kind == "specs" else []
+            conn.send((charts, "MemoryError: chart exceeded the worker memory limit"))
+
+
+class _ChartWorker:
+    def __init__(self, ctx, memory_limit_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise ChartTimeoutError("chart worker failed to start")
+            self.conn.recv()
+            self.ready = True
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ChartPool:
+    """Warm pool of worker processes that render charts.
+
+    Workers take either declarative chart specs or generated matplotlib code. Every
+    job runs in its own process on the Agg backend with a wall-clock and memory
+    limit. Hung or crashed workers are replaced, and workers are recycled after
+    max_jobs_per_worker jobs so leaked figures cannot accumulate. Rendered specs
+    are cached by content hash.
+    """
+
+    def __init__(self, size=None, timeout=None, memory_limit_mb=None, max_jobs_per_worker=None, cache_size=256):
+        self.size = size or int(os.getenv("CHART_POOL_SIZE", min(4, os.cpu_count() or 1)))
+        self.timeout = timeout or float(os.getenv("CHART_TIMEOUT", 30))
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else int(os.getenv("CHART_MEMORY_LIMIT_MB", 2048))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv("CHART_MAX_JOBS_PER_WORKER", 50))
+        self._ctx = mp.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.cache_size = cache_size
+        self._rendered = OrderedDict()
+        self.stats = {"jobs": 0, "failures": 0, "timeouts": 0, "restarts": 0, "cache_hits": 0}
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def wait_ready(self, timeout=60):
+        """Block until the idle workers have started, so the first job does not pay for it."""
+        workers = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            for worker in workers:
+                worker.wait_ready(timeout)
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def _spawn(self):
+        return _ChartWorker(self._ctx, self.memory_limit_mb)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _submit(self, job, timeout=None):
+        if self._closed:
+            raise ChartRenderError("chart pool is closed")
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+        self._count("jobs")
+        try:
+            # Worker start-up (spawn + matplotlib import) does not count against the job
+            try:
+                worker.wait_ready(60)
+            except ChartTimeoutError:
+                worker.kill()
+                worker = None
+                raise
+            worker.conn.send(job)
+            if not worker.conn.poll(timeout):
+                self._count("timeouts")
+                worker.kill()
+                worker = None
+                raise ChartTimeoutError(f"chart rendering exceeded {timeout:.0f}s")
+            charts, error = worker.conn.recv()
+            worker.jobs += 1
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError):
+            if worker is not None:
+                worker.kill()
+            worker = None
+            self._count("failures")
+            raise ChartRenderError("chart worker died while rendering")
+        finally:
+            if worker is not None and worker.jobs >= self.max_jobs_per_worker:
+                worker.stop()
+                worker = None
+            if worker is None:
+                self._count("restarts")
+                worker = self._spawn()
+            self._idle.put(worker)
+        return charts, error
+
+    def render(self, code, timeout=None):
+        """Run chart code in a worker and return a list of (filename, png_bytes)."""
+        charts, error = self._submit(("code", code), timeout)
+        if error:
+            self._count("failures")
+            if not charts:
+                raise ChartRenderError(error)
+            print(f"Chart script failed after {len(charts)} chart(s): {error}")
+        return charts
+
+    def render_specs(self, specs, timeout=None):
+        """Render validated chart specs in one batch and return (filename, png_bytes, spec) for each one that rendered.
+
+        Specs that fail are skipped and the rest numbered consecutively, so the spec
+        is returned with its file to keep titles matched to the right chart.
+        """
+        keys = [spec_key(spec) for spec in specs]
+        with self._lock:
+            images = {key: self._rendered[key] for key in keys if key in self._rendered}
+            for key in images:
+                self._rendered.move_to_end(key)
+            self.stats["cache_hits"] += len(images)
+
+        missing = [(key, spec) for key, spec in zip(keys, specs) if key not in images]
+        if missing:
+            rendered, error = self._submit(("specs", [spec for _, spec in missing]), timeout)
+            if error:
+                print(f"Chart batch failed: {error}")
+            # A short reply still leaves the unanswered specs counted as failures
+            rendered = list(rendered) + [None] * (len(missing) - len(rendered))
+            with self._lock:
+                for (key, _), data in zip(missing, rendered):
+                    if data is None:
+                        self.stats["failures"] += 1
+                        continue
+                    images[key] = data
+                    self._rendered[key] = data
+                while len(self._rendered) > self.cache_size:
+                    self._rendered.popitem(last=False)
+
+        charts = []
+        for key, spec in zip(keys, specs):
+            if key in images:
+                charts.append((f"chart_{len(charts) + 1}.png", images[key], spec))
+        return charts
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+
+def get_chart_pool():
+    """Return the process-wide chart pool, starting its workers on first use."""
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            _chart_pool = ChartPool()
+            atexit.register(_chart_pool.close)
+        return _chart_pool
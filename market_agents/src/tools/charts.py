@@ -0,0 +1,252 @@
+import hashlib
+import io
+import json
+import os
+import re
+
+CHART_TYPES = ("bar", "barh", "stacked_bar", "line", "pie")
+MAX_CHARTS = 3
+MAX_LABELS = 30
+
+# Shared look for every chart, matching the indigo palette of the UI and PDF
+PALETTE = ["#6366f1", "#8b5cf6", "#10b981", "#f59e0b", "#ef4444", "#0ea5e9", "#64748b"]
+TEXT_COLOR = "#1e293b"
+GRID_COLOR = "#e2e8f0"
+
+CHART_SPEC_EXAMPLE = json.dumps({
+    "charts": [{
+        "type": "bar",
+        "title": "Global market size",
+        "labels": ["2022", "2023", "2024"],
+        "series": [{"name": "Market size", "values": [120.5, 134.0, 151.2]}],
+        "x_label": "Year",
+        "y_label": "Market size",
+        "unit": "USD bn",
+    }]
+})
+
+
+class ChartSpecError(ValueError):
+    pass
+
+
+def _number(value, where):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        try:
+            value = float(str(value).replace(",", "").rstrip("%"))
+        except ValueError:
+            raise ChartSpecError(f"{where}: {value!r} is not a number")
+    return float(value)
+
+
+def validate_chart(chart):
+    """Check one chart spec and return a normalized copy."""
+    if not isinstance(chart, dict):
+        raise ChartSpecError("chart spec must be an object")
+
+    kind = str(chart.get("type", "bar")).lower()
+    if kind not in CHART_TYPES:
+        raise ChartSpecError(f"unsupported chart type {kind!r}")
+
+    labels = chart.get("labels")
+    if not isinstance(labels, list) or not labels:
+        raise ChartSpecError("labels must be a non-empty list")
+    if len(labels) > MAX_LABELS:
+        raise ChartSpecError(f"at most {MAX_LABELS} labels are supported")
+    labels = [str(label) for label in labels]
+
+    series = chart.get("series")
+    if not isinstance(series, list) or not series:
+        raise ChartSpecError("series must be a non-empty list")
+    if kind == "pie" and len(series) != 1:
+        raise ChartSpecError("pie charts take exactly one series")
+
+    normalized_series = []
+    for idx, item in enumerate(series):
+        if not isinstance(item, dict):
+            raise ChartSpecError(f"series {idx} must be an object")
+        values = item.get("values")
+        if not isinstance(values, list) or len(values) != len(labels):
+            raise ChartSpecError(f"series {idx} needs one value per label")
+        values = [_number(v, f"series {idx}") for v in values]
+        if kind == "pie" and (any(v < 0 for v in values) or sum(values) <= 0):
+            raise ChartSpecError("pie values must be positive")
+        normalized_series.append({"name": str(item.get("name", f"Series {idx + 1}")), "values": values})
+
+    return {
+        "type": kind,
+        "title": str(chart.get("title", "")),
+        "labels": labels,
+        "series": normalized_series,
+        "x_label": str(chart.get("x_label", "")),
+        "y_label": str(chart.get("y_label", "")),
+        "unit": str(chart.get("unit", "")),
+    }
+
+
+def parse_chart_specs(text):
+    """Parse the LLM's JSON answer and return the valid, normalized chart specs."""
+    text = text.replace("```json", "").replace("```", "").strip()
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ChartSpecError(f"chart spec is not valid JSON: {e}")
+
+    charts = payload.get("charts", []) if isinstance(payload, dict) else payload
+    if not isinstance(charts, list):
+        raise ChartSpecError("expected a list of charts")
+
+    specs = []
+    for chart in charts[:MAX_CHARTS]:
+        try:
+            specs.append(validate_chart(chart))
+        except ChartSpecError as e:
+            print(f"Skipping invalid chart spec: {e}")
+    return specs
+
+
+def spec_key(chart):
+    return hashlib.sha256(json.dumps(chart, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _style_axes(ax):
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    for side in ("left", "bottom"):
+        ax.spines[side].set_color(GRID_COLOR)
+    ax.tick_params(colors=TEXT_COLOR, labelsize=10)
+    ax.grid(True, color=GRID_COLOR, linewidth=0.8, alpha=0.8)
+    ax.set_axisbelow(True)
+
+
+def render_chart(chart, dpi=150):
+    """Render one validated chart spec to PNG bytes."""
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # Figure objects avoid pyplot's global state, so charts can render concurrently
+    fig = Figure(figsize=(10, 6), dpi=dpi, facecolor="white")
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    labels = chart["labels"]
+    names = [s["name"] for s in chart["series"]]
+    values = np.array([s["values"] for s in chart["series"]], dtype=float)
+    colors = [PALETTE[i % len(PALETTE)] for i in range(max(len(labels), len(names)))]
+    x = np.arange(len(labels))
+    kind = chart["type"]
+
+    if kind == "pie":
+        ax.pie(values[0], labels=labels, colors=colors[:len(labels)], autopct="%1.1f%%", startangle=90,
+               wedgeprops={"linewidth": 1.5, "edgecolor": "white"}, textprops={"color": TEXT_COLOR})
+        ax.axis("equal")
+    else:
+        _style_axes(ax)
+        if kind == "line":
+            for i, name in enumerate(names):
+                ax.plot(x, values[i], marker="o", linewidth=2.5, color=colors[i], label=name)
+            ax.set_xticks(x, labels)
+            ax.grid(False, axis="x")
+        elif kind == "stacked_bar":
+            bottom = np.zeros(len(labels))
+            for i, name in enumerate(names):
+                ax.bar(x, values[i], 0.6, bottom=bottom, color=colors[i], label=name)
+                bottom += values[i]
+            ax.set_xticks(x, labels)
+            ax.grid(False, axis="x")
+        else:
+            width = 0.8 / len(names)
+            offsets = (np.arange(len(names)) - (len(names) - 1) / 2) * width
+            for i, name in enumerate(names):
+                if kind == "barh":
+                    ax.barh(x + offsets[i], values[i], width, color=colors[i], label=name)
+                else:
+                    ax.bar(x + offsets[i], values[i], width, color=colors[i], label=name)
+            if kind == "barh":
+                ax.set_yticks(x, labels)
+                ax.invert_yaxis()
+                ax.grid(False, axis="y")
+            else:
+                ax.set_xticks(x, labels)
+                ax.grid(False, axis="x")
+
+        value_label = chart["y_label"] or (names[0] if len(names) == 1 else "")
+        if chart["unit"]:
+            value_label = f"{value_label} ({chart['unit']})" if value_label else chart["unit"]
+        if kind == "barh":
+            ax.set_xlabel(value_label, color=TEXT_COLOR)
+            ax.set_ylabel(chart["x_label"], color=TEXT_COLOR)
+        else:
+            ax.set_xlabel(chart["x_label"], color=TEXT_COLOR)
+            ax.set_ylabel(value_label, color=TEXT_COLOR)
+        if len(labels) > 6 and kind != "barh":
+            for tick in ax.get_xticklabels():
+                tick.set_rotation(30)
+                tick.set_horizontalalignment("right")
+        if len(names) > 1:
+            ax.legend(frameon=False)
+
+    if chart["title"]:
+        ax.set_title(chart["title"], fontsize=14, fontweight="bold", color=TEXT_COLOR, pad=14)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def render_chart_safe(chart):
+    """Render a chart, returning None instead of raising when it cannot be drawn."""
+    try:
+        return render_chart(chart)
+    except Exception as e:
+        print(f"Failed to render chart '{chart.get('title', '')}': {e}")
+        return None
+
+
+_IMAGE_EMBED = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)\)[ \t]*\n?")
+_CHART_NAME = re.compile(r"^chart_\d+\.png$")
+
+
+def planned_chart_names(count=MAX_CHARTS):
+    """File names the writer can reference before the charts exist."""
+    return [f"chart_{idx}.png" for idx in range(1, count + 1)]
+
+
+def reconcile_chart_embeds(report, chart_files, chart_specs=None):
+    """Align the writer's pre-assigned chart embeds with the charts that were actually rendered.
+
+    Embeds of charts that failed to render are removed, captions are replaced by the
+    spec titles where known, and rendered charts the writer never referenced are
+    placed before the conclusion.
+    """
+    available = [os.path.basename(path) for path in chart_files]
+    titles = {}
+    for name, spec in zip(available, chart_specs or []):
+        if spec.get("title"):
+            titles[name] = spec["title"]
+
+    embedded = set()
+
+    def replace(match):
+        caption, target = match.group(1), os.path.basename(match.group(2))
+        if not _CHART_NAME.match(target):
+            return match.group(0)
+        if target not in available or target in embedded:
+            return ""
+        embedded.add(target)
+        ending = "\n" if match.group(0).endswith("\n") else ""
+        return f"![{titles.get(target, caption)}]({target}){ending}"
+
+    report = _IMAGE_EMBED.sub(replace, report)
+
+    missing = [name for name in available if name not in embedded]
+    if missing:
+        block = "\n".join(f"![{titles.get(name, 'Market analysis chart')}]({name})" for name in missing) + "\n\n"
+        conclusion = re.search(r"^#+\s*Conclusion", report, re.MULTILINE | re.IGNORECASE)
+        if conclusion:
+            report = report[:conclusion.start()] + block + report[conclusion.start():]
+        else:
+            report = report.rstrip("\n") + "\n\n" + block
+    return report
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+# Env prefix per limiter name, e.g. RATE_LIMIT_OPENAI_RPM, RATE_LIMIT_SEARCH_RPM
+DEFAULT_LIMITS = {
+    "openai": {"rpm": 0, "tpm": 0},
+    "gemini": {"rpm": 0, "tpm": 0},
+    "search": {"rpm": 30, "tpm": 0},
+}
+
+_RATE_LIMIT_MARKERS = re.compile(r"\b429\b|rate.?limit|resource.?exhausted|quota|too many requests", re.IGNORECASE)
+_TRANSIENT_STATUS = {500, 502, 503, 504}
+
+
+def estimate_tokens(text):
+    """Rough token count used to reserve TPM budget before a call (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _status_code(error):
+    for obj in (error, getattr(error, "response", None)):
+        code = getattr(obj, "status_code", None) or getattr(obj, "code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_rate_limit_error(error):
+    return _status_code(error) == 429 or bool(_RATE_LIMIT_MARKERS.search(f"{type(error).__name__} {error}"))
+
+
+def is_retryable_error(error):
+    # OpenAI reports an exhausted billing quota as a 429 too, but waiting will not fix it
+    if "insufficient_quota" in str(error):
+        return False
+    if is_rate_limit_error(error):
+        return True
+    return _status_code(error) in _TRANSIENT_STATUS or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _used_tokens(result):
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict):
+        return usage.get("total_tokens")
+    return None
+
+
+class TokenBucket:
+    """Bucket refilled continuously at per_minute units per minute.
+
+    Callers reserve units up front and the level may go negative; the returned
+    wait is how long the caller must sleep before its reservation is covered. This
+    keeps waiters in arrival order without holding the lock while sleeping.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """Process-wide request and token budget for one provider, with retry on throttling.
+
+    Every call reserves one request and its estimated tokens before it is made and
+    settles the estimate against the reported usage afterwards, or refunds the
+    tokens if it fails. Rate-limit and
+    transient errors are retried with jittered exponential backoff, and a 429
+    pauses every caller of the limiter rather than just the one that hit it.
+    """
+
+    def __init__(self, name, rpm=0, tpm=0, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._cooldown_until = 0.0
+        self._waits = deque(maxlen=1000)
+        self.calls = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _acquire(self, tokens):
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self._cooldown_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self.calls += 1
+            self._waits.append(wait)
+            if wait > 0:
+                self.throttled += 1
+                self.wait_total += wait
+        return wait
+
+    def _settle(self, tokens, result):
+        used = _used_tokens(result)
+        if self.tokens is None or used is None:
+            return
+        with self._lock:
+            self.tokens.adjust(used - tokens, time.monotonic())
+
+    def _refund(self, tokens):
+        # A failed call used no tokens; the request itself still counts against the RPM budget
+        if self.tokens is None or not tokens:
+            return
+        with self._lock:
+            self.tokens.adjust(-tokens, time.monotonic())
+
+    def _backoff(self, error, attempt):
+        """Return the delay before the next attempt, or None if the error should be raised."""
+        if attempt >= self.max_retries or not is_retryable_error(error):
+            with self._lock:
+                self.failures += 1
+            return None
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self._lock:
+            self.retries += 1
+            if is_rate_limit_error(error):
+                self.rate_limited += 1
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+        print(f"--- Rate limit: {self.name} call failed ({type(error).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s ---")
+        return delay
+
+    def call(self, fn, *args, tokens=0, **kwargs):
+        """Call fn within the budget, retrying throttled and transient failures."""
+        attempt = 0
+        while True:
+            wait = self._acquire(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._refund(tokens)
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._settle(tokens, result)
+            return result
+
+    async def acall(self, fn, *args, tokens=0, **kwargs):
+        """Async counterpart of call for coroutine functions."""
+        attempt = 0
+        while True:
+            wait = self._acquire(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                self._refund(tokens)
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._settle(tokens, result)
+            return result
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "wait_total": round(self.wait_total, 3),
+                "wait_avg": round(self.wait_total / self.calls, 3) if self.calls else 0.0,
+                "wait_p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "wait_max": round(waits[-1], 3) if waits else 0.0,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name):
+    """Return the process-wide limiter for a provider or "search", configured from RATE_LIMIT_* variables."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            defaults = DEFAULT_LIMITS.get(name, {"rpm": 0, "tpm": 0})
+            prefix = f"RATE_LIMIT_{name.upper()}"
+            limiter = RateLimiter(
+                name,
+                rpm=float(os.getenv(f"{prefix}_RPM", defaults["rpm"])),
+                tpm=float(os.getenv(f"{prefix}_TPM", defaults["tpm"])),
+                max_retries=int(os.getenv("RATE_LIMIT_MAX_RETRIES", 5)),
+                base_delay=float(os.getenv("RATE_LIMIT_BASE_DELAY", 1)),
+                max_delay=float(os.getenv("RATE_LIMIT_MAX_DELAY", 60)),
+            )
+            _limiters[name] = limiter
+        return limiter
+
+
+def rate_limit_stats():
+    """Wait-time and retry metrics of every limiter created so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
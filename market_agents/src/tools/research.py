@@ -0,0 +1,41 @@
+import re
+
+RESEARCH_ASPECTS = [
+    "market size and growth forecast",
+    "key competitors and market share",
+    "pricing and business models",
+    "regulation and policy changes",
+    "investment, funding and M&A activity",
+]
+
+
+def expand_queries(topic, feedback=None, aspects=RESEARCH_ASPECTS):
+    """Build the list of sub-queries used for one research pass."""
+    if feedback:
+        queries = [f"market research for {topic} focusing on: {feedback}"]
+    else:
+        queries = [f"latest market trends and news for {topic} last 12 months"]
+    queries.extend(f"{topic} {aspect}" for aspect in aspects)
+    return queries
+
+
+def _snippet_key(snippet):
+    return re.sub(r"\W+", " ", snippet.lower()).strip()
+
+
+def merge_results(results):
+    """Merge search results in order, dropping sentences already seen in earlier results."""
+    seen = set()
+    merged = []
+    for result in results:
+        if not result:
+            continue
+        unique = []
+        for snippet in re.split(r"(?<=[.!?])\s+|\n+", result):
+            key = _snippet_key(snippet)
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(snippet.strip())
+        if unique:
+            merged.append(" ".join(unique))
+    return merged
@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+
+TRACE_FILE = "trace.jsonl"
+
+# USD per million (input, output) tokens, used to estimate the cost of a run.
+# Models not listed are traced without a cost.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# (trace path, span) of the innermost open span in this thread or task
+_current = contextvars.ContextVar("trace_span", default=None)
+_write_lock = threading.Lock()
+
+
+def tracing_enabled():
+    return os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+
+
+def trace_path(workspace_dir):
+    return os.path.join(workspace_dir, TRACE_FILE)
+
+
+def _append(path, span):
+    line = json.dumps(span, default=str) + "\n"
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _new_span(kind, name, path, attrs):
+    parent = _current.get()
+    if path is None and parent is not None:
+        path = parent[0]
+    span = {
+        "id": uuid.uuid4().hex[:12],
+        "parent": parent[1]["id"] if parent else None,
+        "kind": kind,
+        "name": name,
+        "start": time.time(),
+        **attrs,
+    }
+    return (path if tracing_enabled() else None), span
+
+
+def _write_span(path, span):
+    try:
+        _append(path, span)
+    except OSError as e:
+        print(f"Failed to write trace span: {e}")
+
+
+@contextmanager
+def trace_span(kind, name, path=None, **attrs):
+    """Time the enclosed block and append it to a run's trace as one JSON line.
+
+    Without path the span joins the trace of the enclosing span, so external calls
+    made inside a node are recorded under that node. Attributes set on the yielded
+    dict are written with the span. Outside a traced run nothing is recorded.
+    """
+    path, span = _new_span(kind, name, path, attrs)
+    if path is None:
+        yield span
+        return
+
+    token = _current.set((path, span))
+    started = time.perf_counter()
+    try:
+        yield span
+        span["status"] = "ok"
+    except BaseException as e:
+        span["status"] = "error"
+        span["error"] = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        span["duration"] = round(time.perf_counter() - started, 6)
+        _current.reset(token)
+        _write_span(path, span)
+
+
+@asynccontextmanager
+async def atrace_span(kind, name, path=None, **attrs):
+    """Async counterpart of trace_span that writes the span off the event loop."""
+    path, span = _new_span(kind, name, path, attrs)
+    if path is None:
+        yield span
+        return
+
+    token = _current.set((path, span))
+    started = time.perf_counter()
+    try:
+        yield span
+        span["status"] = "ok"
+    except BaseException as e:
+        span["status"] = "error"
+        span["error"] = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        span["duration"] = round(time.perf_counter() - started, 6)
+        _current.reset(token)
+        await asyncio.to_thread(_write_span, path, span)
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None or input_tokens is None or output_tokens is None:
+        return None
+    return round((input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000, 6)
+
+
+def record_llm_response(span, response, model):
+    """Add the response size, token usage and estimated cost of an LLM call to its span."""
+    content = getattr(response, "content", "")
+    span["response_chars"] = len(content) if isinstance(content, str) else None
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict):
+        span["input_tokens"] = usage.get("input_tokens")
+        span["output_tokens"] = usage.get("output_tokens")
+        span["cost"] = estimate_cost(model, span["input_tokens"], span["output_tokens"])
+
+
+def payload_size(value):
+    """Characters of text in a node update, counting strings inside lists."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(payload_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    return 0
+
+
+def load_trace(path):
+    if not path or not os.path.exists(path):
+        return []
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the rest of the trace is still useful
+                continue
+    return spans
+
+
+def summarize_trace(spans):
+    """Aggregate spans into wall time, time per node and totals per kind of external call."""
+    if not spans:
+        return None
+    nodes = {}
+    calls = {}
+    for span in spans:
+        duration = span.get("duration") or 0.0
+        if span["kind"] == "node":
+            entry = nodes.setdefault(span["name"], {"runs": 0, "seconds": 0.0, "output_chars": 0})
+            entry["runs"] += 1
+            entry["seconds"] += duration
+            entry["output_chars"] += span.get("output_chars") or 0
+            continue
+        entry = calls.setdefault(span["kind"], {
+            "calls": 0, "cached": 0, "errors": 0, "seconds": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "cost": 0.0,
+            "prompt_chars": 0, "response_chars": 0,
+        })
+        entry["calls"] += 1
+        entry["cached"] += 1 if span.get("cached") else 0
+        entry["errors"] += 1 if span.get("status") == "error" else 0
+        entry["seconds"] += duration
+        for key in ("input_tokens", "output_tokens", "cost", "prompt_chars", "response_chars"):
+            entry[key] += span.get(key) or 0
+
+    started = min(span["start"] for span in spans)
+    finished = max(span["start"] + (span.get("duration") or 0.0) for span in spans)
+    return {
+        "wall_seconds": finished - started,
+        "revisions": max((span.get("revision_count") or 0 for span in spans), default=0),
+        "input_tokens": sum(c["input_tokens"] for c in calls.values()),
+        "output_tokens": sum(c["output_tokens"] for c in calls.values()),
+        "cost": sum(c["cost"] for c in calls.values()),
+        "nodes": nodes,
+        "calls": calls,
+    }
+
+
+def format_trace_summary(summary):
+    """Render a trace summary as markdown tables."""
+    if not summary:
+        return "*No trace recorded for this report.*"
+    lines = [
+        f"**Wall time:** {summary['wall_seconds']:.1f}s &nbsp; **Revisions:** {summary['revisions']} &nbsp; "
+        f"**Tokens:** {summary['input_tokens']:,} in / {summary['output_tokens']:,} out &nbsp; "
+        f"**Estimated cost:** ${summary['cost']:.4f}",
+        "",
+        "| Step | Runs | Time (s) | Output (chars) |",
+        "|---|---:|---:|---:|",
+    ]
+    for name, node in summary["nodes"].items():
+        lines.append(f"| {name} | {node['runs']} | {node['seconds']:.2f} | {node['output_chars']:,} |")
+    lines += [
+        "",
+        "| Calls | Count | Cached | Errors | Time (s) | Tokens in | Tokens out | Prompt (chars) | Response (chars) |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for kind, call in summary["calls"].items():
+        lines.append(
+            f"| {kind} | {call['calls']} | {call['cached']} | {call['errors']} | {call['seconds']:.2f} | "
+            f"{call['input_tokens']:,} | {call['output_tokens']:,} | {call['prompt_chars']:,} | {call['response_chars']:,} |"
+        )
+    return "\n".join(lines)
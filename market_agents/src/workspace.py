@@ -0,0 +1,47 @@
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+
+def new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def workspace_root():
+    return os.getenv("WORKSPACE_DIR", "runs")
+
+
+class Workspace:
+    """Private directory for the artifacts of a single report run."""
+
+    def __init__(self, run_id=None, root=None):
+        self.run_id = run_id or new_run_id()
+        self.root = root or workspace_root()
+        self.path = os.path.join(self.root, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def cleanup_stale_workspaces(root=None, max_age=None):
+    """Remove workspaces left behind by runs older than max_age seconds."""
+    root = root or workspace_root()
+    if max_age is None:
+        max_age = float(os.getenv("WORKSPACE_MAX_AGE", 24 * 60 * 60))
+    if not os.path.exists(root):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
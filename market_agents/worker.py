@@ -0,0 +1,58 @@
+import argparse
+import os
+import signal
+import threading
+import time
+
+from batch import load_topics
+from src.history import HistoryManager
+from src.job_queue import JobQueue, default_worker_id, start_workers
+from src.jobs import QueueFull
+from src.workspace import cleanup_stale_workspaces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run report jobs from a shared job queue")
+    parser.add_argument("--queue", default=os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3")), help="SQLite job queue shared by the workers on this host")
+    parser.add_argument("--history-dir", default=os.getenv("HISTORY_DIR", "history"))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_WORKERS", 4)), help="jobs this process runs at once")
+    parser.add_argument("--lease", type=float, default=float(os.getenv("JOB_LEASE_SECONDS", 120)), help="seconds before a silent worker's job is retried elsewhere")
+    parser.add_argument("--worker-id", default=default_worker_id())
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    parser.add_argument("--submit", metavar="TOPICS", help="enqueue the topics of a JSONL file (as batch.py reads them) and exit")
+    parser.add_argument("--provider", default="gemini", choices=["gemini", "openai"], help="default provider for --submit")
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.queue)
+    if args.submit:
+        topics = load_topics(args.submit, args.provider)
+        try:
+            for topic, provider in topics:
+                job_queue.submit(topic, provider)
+        except QueueFull as e:
+            print(e)
+        return
+
+    cleanup_stale_workspaces()
+    job_queue.gc()
+    stop = threading.Event()
+    # Finish the running jobs, but stop claiming new ones
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    started = time.perf_counter()
+    threads = start_workers(job_queue, HistoryManager(args.history_dir), args.concurrency, stop,
+                            worker_id=args.worker_id, lease_seconds=args.lease, once=args.once)
+    print(f"--- Worker {args.worker_id}: {args.concurrency} slots on {args.queue} ---")
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    print(f"--- Worker {args.worker_id}: Stopped after {time.perf_counter() - started:.1f}s ---")
+
+
+if __name__ == "__main__":
+    main()